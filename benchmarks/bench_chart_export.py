@@ -0,0 +1,77 @@
+# Charts per second for ch3_visualizing_data.export_charts with 1 and more worker processes,
+# against the same charts drawn the pyplot way (plt.figure() ... plt.savefig(), plt.close()).
+#
+#   python -m benchmarks.bench_chart_export [--charts 400] [--workers 4] [--format png]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from function_tools import ch3_visualizing_data as viz
+
+
+def chart_specs(count, directory, extension):
+    rng = random.Random(0)
+    specs = []
+    for i in range(count):
+        xs = list(range(50))
+        kind = ("line", "bar", "histogram", "scatter")[i % 4]
+        spec = {"kind": kind, "path": os.path.join(directory, f"chart{i}.{extension}"),
+                "title": f"chart {i}", "xlabel": "x", "ylabel": "y"}
+        if kind == "histogram":
+            spec["values"] = [rng.gauss(0, 1) for _ in range(1000)]
+        elif kind == "bar":
+            spec.update(x=[f"item {j}" for j in range(8)], y=[rng.random() for _ in range(8)])
+        else:
+            spec.update(x=xs, y=[rng.random() for _ in xs])
+        specs.append(spec)
+    return specs
+
+
+def pyplot_way(specs):
+    plt = viz.pyplot()
+    for spec in specs:
+        plt.figure()
+        if spec["kind"] == "line":
+            plt.plot(spec["x"], spec["y"])
+        elif spec["kind"] == "bar":
+            plt.bar(range(len(spec["x"])), spec["y"])
+            plt.xticks(range(len(spec["x"])), spec["x"])
+        elif spec["kind"] == "histogram":
+            plt.hist(spec["values"], bins=10)
+        else:
+            plt.scatter(spec["x"], spec["y"])
+        plt.title(spec["title"])
+        plt.xlabel(spec["xlabel"])
+        plt.ylabel(spec["ylabel"])
+        plt.savefig(spec["path"])
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        specs = chart_specs(args.charts, directory, args.format)
+        start = time.perf_counter()
+        pyplot_way(specs)
+        seconds = time.perf_counter() - start
+        print(f"{os.cpu_count()} CPUs, {args.charts} {args.format} charts")
+        print(f"{'pyplot, one at a time':<32}{args.charts / seconds:>8.1f} charts/s")
+        for workers in sorted({1, args.workers}):
+            report = viz.export_charts(specs, workers=workers)
+            print(f"{f'export_charts, {workers} workers':<32}{report.charts_per_second:>8.1f} charts/s"
+                  + (f"  ({len(report.failures)} failed)" if report.failures else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Times matrix_multiply against the naive formulation
+#   make_matrix(n, n, lambda i, j: dot(get_row(A, i), get_column(B, j)))
+# for square matrices of increasing size. The pure-Python paths are cubic, so sizes above
+# --max-naive / --max-python are skipped (pass larger limits to run them anyway).
+#
+#   python -m benchmarks.bench_matmul [--sizes 100 200 500 1000 2000] [--workers 4]
+
+import argparse
+import os
+import random
+import time
+
+from function_tools import ch4_linear_algebra as la
+
+
+def random_matrix(n):
+    return [[random.random() for _ in range(n)] for _ in range(n)]
+
+
+def naive_multiply(A, B):
+    num_rows, num_cols = la.shape(A)[0], la.shape(B)[1]
+    return la.make_matrix(num_rows, num_cols,
+                          lambda i, j: la.dot(la.get_row(A, i), la.get_column(B, j)))
+
+
+def seconds(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 200, 500, 1000, 2000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-size", type=int, default=64)
+    parser.add_argument("--max-naive", type=int, default=300)
+    parser.add_argument("--max-python", type=int, default=1000)
+    args = parser.parse_args()
+
+    columns = ["naive", "blocked", f"blocked x{args.workers}", "Matrix"]
+    print(f"{'n':>6}" + "".join(f"{name:>16}" for name in columns) + "   (seconds)")
+    for n in args.sizes:
+        A, B = random_matrix(n), random_matrix(n)
+        row = []
+        row.append(seconds(naive_multiply, A, B) if n <= args.max_naive else None)
+        if n <= args.max_python:
+            row.append(seconds(la.matrix_multiply, A, B, block_size=args.block_size))
+            row.append(seconds(la.matrix_multiply, A, B, block_size=args.block_size,
+                               workers=args.workers))
+        else:
+            row += [None, None]
+        MA, MB = la.Matrix(A), la.Matrix(B)
+        row.append(seconds(la.matrix_multiply, MA, MB) if la.np is not None or n <= args.max_python
+                   else None)
+        print(f"{n:>6}" + "".join(f"{'skipped':>16}" if t is None else f"{t:>16.4f}" for t in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Throughput of the chunked, process-parallel statistics in function_tools.mmap_dataset
+# over a memory-mapped float64 file, as the number of worker processes grows.
+#
+#   python -m benchmarks.bench_mmap_stats [n] [max workers]
+#
+# The workers only speed things up with a free core each: past os.cpu_count() workers (or
+# on a single-core machine, past one) the numbers show the pool's overhead, not scaling.
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from function_tools import mmap_dataset
+
+
+def main(n, max_workers):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "values.bin")
+        # (rounded, so that the mode is a meaningful question)
+        mmap_dataset.write_binary(path, (round(rng.lognormvariate(0, 1), 2) for _ in range(n)))
+        megabytes = os.path.getsize(path) / 1e6
+        data = mmap_dataset.MappedArray(path)
+        chunk_size = max(n // (4 * max_workers), 1)
+        functions = [
+            ("mean", lambda workers: mmap_dataset.mean(data, workers=workers, chunk_size=chunk_size)),
+            ("data_range", lambda workers: mmap_dataset.data_range(data, workers=workers,
+                                                                  chunk_size=chunk_size)),
+            ("median", lambda workers: mmap_dataset.median(data, workers=workers,
+                                                          chunk_size=chunk_size)),
+            ("mode", lambda workers: mmap_dataset.mode(data, workers=workers, chunk_size=chunk_size)),
+        ]
+        worker_counts = [w for w in (1, 2, 4, 8, 16, 32) if w <= max_workers]
+        print(f"{n:,} float64 values ({megabytes:.0f} MB), {os.cpu_count()} CPUs; MB/s:")
+        print(f"{'function':<12}" + "".join(f"{f'{w} workers':>12}" for w in worker_counts))
+        for name, fn in functions:
+            row = []
+            for workers in worker_counts:
+                start = time.perf_counter()
+                fn(workers)
+                row.append(megabytes / (time.perf_counter() - start))
+            print(f"{name:<12}" + "".join(f"{rate:>12.1f}" for rate in row))
+        data.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
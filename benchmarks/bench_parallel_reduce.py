@@ -0,0 +1,64 @@
+# Times parallel_reduce against functools.reduce for the two reductions the repo uses:
+# multiply over the integers 1..n (a factorial: the values grow, so bracketing matters) and
+# vector_add over many vectors (vector_sum), and shows the float error of each way of summing.
+#
+#   python -m benchmarks.bench_parallel_reduce [--workers 4] [--factorial 100000]
+#                                              [--vectors 1000000] [--dimension 10]
+
+import argparse
+import math
+import os
+import random
+import time
+from functools import reduce
+
+from function_tools.ch4_linear_algebra import vector_add
+from function_tools.functional_tools import multiply, parallel_reduce
+
+
+def seconds(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def vector_error(total, exact):
+    return max(abs(t - e) for t, e in zip(total, exact))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--factorial", type=int, default=100_000)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dimension", type=int, default=10)
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers")
+
+    numbers = range(1, args.factorial + 1)
+    rng = random.Random(0)
+    vectors = [[rng.random() for _ in range(args.dimension)] for _ in range(args.vectors)]
+    exact = [math.fsum(column) for column in zip(*vectors)]
+
+    print(f"{'reduction':<44}{'seconds':>10}{'speedup':>9}{'max error':>12}")
+    for name, op, values, check in [
+        (f"multiply over 1..{args.factorial:,}", multiply, numbers, None),
+        (f"vector_add over {args.vectors:,} vectors", vector_add, vectors, exact),
+    ]:
+        baseline, _ = seconds(reduce, op, values)
+        rows = [("functools.reduce", baseline, reduce(op, values) if check else None)]
+        for label, workers, pairwise in [("parallel_reduce, 1 worker", 1, False),
+                                         ("parallel_reduce, 1 worker, pairwise", 1, True),
+                                         (f"parallel_reduce, {args.workers} workers", args.workers, False),
+                                         (f"parallel_reduce, {args.workers} workers, pairwise",
+                                          args.workers, True)]:
+            elapsed, result = seconds(parallel_reduce, op, values, workers=workers, pairwise=pairwise)
+            rows.append((label, elapsed, result if check else None))
+        print(name)
+        for label, elapsed, result in rows:
+            error = f"{vector_error(result, check):12.2e}" if check else ""
+            print(f"  {label:<42}{elapsed:>10.3f}{baseline / elapsed:>8.1f}x{error}")
+
+
+if __name__ == "__main__":
+    main()
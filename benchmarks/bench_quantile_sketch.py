@@ -0,0 +1,39 @@
+# Accuracy and memory of KLLSketch quantiles against the exact ch5_statistics.quantiles,
+# for a range of sketch sizes k.
+#
+#   python -m benchmarks.bench_quantile_sketch [n]
+
+import bisect
+import random
+import sys
+import time
+
+from function_tools import ch5_statistics as stats
+
+PS = [0.01, 0.10, 0.25, 0.50, 0.75, 0.90, 0.99]
+
+
+def main(n):
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 1) for _ in range(n)]     # latency-like, long tail
+
+    start = time.perf_counter()
+    stats.quantiles(values, PS)
+    exact_seconds = time.perf_counter() - start
+    sorted_values = sorted(values)
+    print(f"n = {n:,}; exact quantiles: {exact_seconds:.3f}s, "
+          f"~{8 * n / 1e6:.1f} MB of float64 data to hold")
+    print(f"{'k':>6}{'retained':>10}{'bytes':>10}{'max rank error':>16}{'update (s)':>12}")
+    for k in (50, 100, 200, 400, 800, 1600):
+        start = time.perf_counter()
+        sketch = stats.KLLSketch(k=k, seed=1).update_many(values)
+        update_seconds = time.perf_counter() - start
+        estimates = stats.quantiles(sketch, PS)
+        error = max(abs(bisect.bisect_left(sorted_values, estimate) / n - p)
+                    for estimate, p in zip(estimates, PS))
+        print(f"{k:>6}{len(sketch):>10}{len(sketch.to_bytes()):>10}{error:>16.4%}"
+              f"{update_seconds:>12.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,50 @@
+# Compares the list-of-floats functions in ch4_linear_algebra with the same functions
+# applied to array-backed Vectors and Matrices.
+#
+#   python -m benchmarks.bench_vectors [size ...]
+
+import random
+import sys
+import timeit
+
+from function_tools import ch4_linear_algebra as la
+
+
+def best_of(fn, repeat=5):
+    """fastest of `repeat` timed calls to fn, in seconds"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def cases(n):
+    v = [random.random() for _ in range(n)]
+    w = [random.random() for _ in range(n)]
+    V, W = la.Vector(v), la.Vector(w)
+    num_cols = 100
+    rows = [[random.random() for _ in range(num_cols)] for _ in range(n // num_cols)]
+    M = la.Matrix(rows)
+    return [
+        ("vector_add", lambda: la.vector_add(v, w), lambda: la.vector_add(V, W)),
+        ("vector_subtract", lambda: la.vector_subtract(v, w), lambda: la.vector_subtract(V, W)),
+        ("scalar_multiply", lambda: la.scalar_multiply(3.0, v), lambda: la.scalar_multiply(3.0, V)),
+        ("dot", lambda: la.dot(v, w), lambda: la.dot(V, W)),
+        ("distance", lambda: la.distance(v, w), lambda: la.distance(V, W)),
+        ("get_column", lambda: la.get_column(rows, 7), lambda: la.get_column(M, 7)),
+    ]
+
+
+def main(sizes):
+    la._load_numpy()
+    backend = "numpy" if la.np is not None else "array('d')"
+    print(f"Vector backend: {backend}")
+    print(f"{'function':<16}{'n':>10}{'list (ms)':>12}{'Vector (ms)':>13}{'speedup':>9}")
+    for n in sizes:
+        for name, list_fn, vector_fn in cases(n):
+            t_list, t_vector = best_of(list_fn), best_of(vector_fn)
+            print(f"{name:<16}{n:>10}{t_list * 1e3:>12.3f}{t_vector * 1e3:>13.3f}"
+                  f"{t_list / t_vector:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 500_000])
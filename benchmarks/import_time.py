@@ -0,0 +1,60 @@
+# Checks that importing function_tools (and pulling dot and median out of it) stays within
+# an import-time budget, and that it doesn't drag in matplotlib or NumPy. Exits with status 1
+# if it doesn't, so it can gate CI.
+#
+#   python -m benchmarks.import_time [budget in ms]
+#
+# The statement runs in a fresh interpreter and is timed there with a wall clock, since
+# -X importtime doesn't see the submodules function_tools' __getattr__ loads through
+# importlib; the per-module breakdown comes from -X importtime as far as it goes.
+
+import json
+import subprocess
+import sys
+
+STATEMENT = "import function_tools; function_tools.dot; function_tools.median"
+FORBIDDEN = ("matplotlib", "numpy")
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+{STATEMENT}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def import_times(statement=STATEMENT):
+    """(wall-clock seconds the statement took, the modules loaded after it, and
+    {module: cumulative microseconds} for the function_tools modules -X importtime saw)"""
+    probe = PROBE.replace(STATEMENT, statement)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip().startswith("function_tools"):
+            times[name.strip()] = int(cumulative)
+    report = json.loads(result.stdout.splitlines()[-1])
+    return report["seconds"], set(report["modules"]), times
+
+
+def main(budget_ms):
+    seconds, imported, times = import_times(STATEMENT)
+    total_ms = seconds * 1000
+    for name, us in sorted(times.items(), key=lambda item: -item[1]):
+        print(f"{us / 1000:8.1f} ms  {name}")
+    print(f"{total_ms:8.1f} ms  total, wall clock (budget {budget_ms} ms)")
+    failures = [f"{module} was imported" for module in FORBIDDEN
+                if any(name == module or name.startswith(module + ".") for name in imported)]
+    if total_ms > budget_ms:
+        failures.append(f"import took {total_ms:.1f} ms, over the {budget_ms} ms budget")
+    for failure in failures:
+        print("FAIL:", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else 50))
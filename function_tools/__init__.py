@@ -0,0 +1,73 @@
+# Data science from scratch, one module per chapter.
+#
+# Importing the package runs nothing and imports nothing else: each chapter module is
+# imported the first time it (or one of its functions) is looked up, so a worker that only
+# needs function_tools.dot never loads the statistics chapter, let alone matplotlib.
+#
+#   import function_tools
+#   function_tools.dot([1, 2], [3, 4])              # imports ch4_linear_algebra, then calls it
+#   from function_tools import median               # imports ch5_statistics
+
+import importlib
+
+_SUBMODULES = (
+    "ch3_visualizing_data",
+    "ch4_linear_algebra",
+    "ch5_statistics",
+    "columnar",
+    "functional_tools",
+    "mmap_dataset",
+)
+
+# public name -> the submodule that defines it (the memory-mapped versions of mean, median
+# and friends are reached through function_tools.mmap_dataset)
+_ATTRIBUTES = {name: module for module, names in {
+    "ch3_visualizing_data": [
+        "pyplot", "histogram", "density_grid", "plot_density", "plot_histogram", "lttb",
+        "LiveLine", "ChartExport", "render_chart", "export_charts",
+    ],
+    "ch4_linear_algebra": [
+        "vector_add", "vector_subtract", "vector_sum", "scalar_multiply", "VectorAccumulator",
+        "vector_mean", "dot", "sum_of_squares", "magnitude", "squared_distance", "distance",
+        "pairwise_squared_distances", "KDTree", "shape", "get_row", "get_column", "make_matrix",
+        "is_diagonal", "LazyMatrix", "DiagonalMatrix", "ConstantMatrix", "transpose",
+        "matrix_vector_multiply", "matrix_multiply", "Vector", "Matrix", "CSRMatrix",
+        "LUDecomposition", "CholeskyDecomposition", "FactorizationCache", "factorizations",
+        "factor", "solve", "inverse", "determinant",
+    ],
+    "ch5_statistics": [
+        "RunningStats", "mean", "KLLSketch", "SortedViewCache", "sorted_views", "median",
+        "quantile", "quantiles", "bincount", "MisraGries", "CountMinSketch", "top_k", "mode",
+        "data_range", "variance", "standard_deviation", "RunningCovariance", "covariance_matrix",
+        "correlation_matrix", "covariance", "correlation",
+    ],
+    "functional_tools": [
+        "exp", "two_to_the", "three_to_the", "squre_of", "double", "list_doubler", "multiply",
+        "is_even", "list_evener", "list_product", "add", "magic", "other_way_magic", "f2",
+        "doubler_correct", "CallStats", "profile", "instrumentation_enabled", "instrument",
+        "instrument_all", "reset_profile", "profile_report", "CacheInfo", "memoize",
+        "Stream", "parallel_reduce",
+    ],
+    "columnar": [
+        "ColumnarDataset",
+    ],
+    "mmap_dataset": [
+        "MappedArray", "write_binary",
+    ],
+}.items() for name in names}
+
+__all__ = list(_SUBMODULES) + list(_ATTRIBUTES)
+
+
+def __getattr__(name):                              # PEP 562: called for missing attributes
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    if name not in _ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{_ATTRIBUTES[name]}"), name)
+    globals()[name] = value                         # so the next lookup doesn't come here
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,28 @@
+# What the rest of the package needs to know about NumPy and typed binary arrays, kept in
+# one place. NumPy takes a while to import, so importing function_tools (or any of its
+# modules) must never import it: load_numpy does, the first time some code has work for it,
+# and is_ndarray answers without it (if x is a NumPy array, whoever made x imported NumPy).
+
+import sys
+
+# the dtypes MappedArray and ColumnarDataset store, and their array module typecodes
+DTYPES = {"float64": "d", "float32": "f", "int64": "q", "int32": "i"}
+
+_numpy = None
+_numpy_loaded = False
+
+def load_numpy():
+    """NumPy, imported the first time it's asked for, or None if it isn't installed"""
+    global _numpy, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+        except ImportError:
+            return None
+        _numpy = numpy
+    return _numpy
+
+def is_ndarray(x):
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(x, numpy.ndarray)
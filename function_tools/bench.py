@@ -0,0 +1,383 @@
+# Times every public function of ch4_linear_algebra and ch5_statistics on synthetic data
+# of growing size, records the time and peak memory of each call, and (given a baseline from
+# an earlier run) fails if anything got slower or hungrier than the threshold allows.
+#
+#   python -m function_tools.bench                              # print a table
+#   python -m function_tools.bench --output bench.json          # ... and save the results
+#   python -m function_tools.bench --baseline bench.json        # exit 1 on a regression
+#   python -m function_tools.bench --sizes 1000 10000 --only median quantile
+#
+# `n` is the number of values a case works on: an n-vector, a sqrt(n) x sqrt(n) matrix,
+# n points for the distance and tree cases. The growth column is the slope of log(time)
+# against log(n) between the smallest and largest sizes: ~1 for linear, ~2 for quadratic.
+
+import argparse
+import fnmatch
+import json
+import math
+import platform
+import random
+import re
+import sys
+import timeit
+import tracemalloc
+
+from . import ch4_linear_algebra as la
+from . import ch5_statistics as stats
+
+
+# Synthetic data. Everything comes from a seeded generator, so two runs (on any machine)
+# benchmark the same inputs.
+
+def random_vector(rng, n):
+    return [rng.random() for _ in range(n)]
+
+def random_vectors(rng, count, dimension):
+    return [random_vector(rng, dimension) for _ in range(count)]
+
+def random_matrix(rng, num_rows, num_cols):
+    return random_vectors(rng, num_rows, num_cols)
+
+def random_counts(rng, n, distinct=1000):
+    """n integers in [0, distinct), skewed so a few values are much more common than the rest"""
+    return [min(int(rng.paretovariate(1.2)) - 1, distinct - 1) for _ in range(n)]
+
+def side(n):
+    """the side of a square matrix with about n entries"""
+    return max(1, math.isqrt(n))
+
+
+# A case is a function of (rng, n) that builds its inputs and returns the call to time;
+# building the inputs isn't part of the measurement.
+
+def _vector_cases():
+    cases = {}
+    for name in ("vector_add", "vector_subtract", "dot", "squared_distance", "distance"):
+        def case(rng, n, fn=getattr(la, name)):
+            v, w = random_vector(rng, n), random_vector(rng, n)
+            return lambda: fn(v, w)
+        cases[name] = case
+    for name in ("sum_of_squares", "magnitude"):
+        def case(rng, n, fn=getattr(la, name)):
+            v = random_vector(rng, n)
+            return lambda: fn(v)
+        cases[name] = case
+    for name in ("vector_sum", "vector_mean"):
+        def case(rng, n, fn=getattr(la, name)):
+            vectors = random_vectors(rng, side(n), side(n))
+            return lambda: fn(vectors)
+        cases[name] = case
+    return cases
+
+def _array_dot(rng, n):
+    v, w = la.Vector(random_vector(rng, n)), la.Vector(random_vector(rng, n))
+    return lambda: la.dot(v, w)
+
+def _compensated_sum(rng, n):
+    vectors = random_vectors(rng, side(n), side(n))
+    return lambda: la.vector_sum(vectors, compensated=True)
+
+def _scalar_multiply(rng, n):
+    v = random_vector(rng, n)
+    return lambda: la.scalar_multiply(3.0, v)
+
+def _pairwise_squared_distances(rng, n):
+    A = random_vectors(rng, side(n), 3)
+    B = random_vectors(rng, side(n), 3)
+    return lambda: la.pairwise_squared_distances(A, B)
+
+def _kd_tree_build(rng, n):
+    points = random_vectors(rng, n, 3)
+    return lambda: la.KDTree(points)
+
+def _kd_tree_query(rng, n):
+    tree = la.KDTree(random_vectors(rng, n, 3))
+    queries = random_vectors(rng, 100, 3)
+    return lambda: [tree.query(point, k=5) for point in queries]
+
+def _matrix_case(fn):
+    def case(rng, n):
+        A = random_matrix(rng, side(n), side(n))
+        return lambda: fn(A)
+    return case
+
+def _get_column(rng, n):
+    A = random_matrix(rng, side(n), side(n))
+    return lambda: la.get_column(A, side(n) // 2)
+
+def _make_matrix(rng, n):
+    return lambda: la.make_matrix(side(n), side(n), la.is_diagonal)
+
+def _lazy_matrix(rng, n):
+    return lambda: la.LazyMatrix(side(n), side(n), lambda i, j: i * j).row(0)
+
+def _diagonal_matrix(rng, n):
+    return lambda: la.transpose(la.DiagonalMatrix(side(n)))
+
+def _constant_matrix(rng, n):
+    return lambda: la.transpose(la.ConstantMatrix(side(n), side(n), 1.0))
+
+def _matrix_vector_multiply(rng, n):
+    A, v = random_matrix(rng, side(n), side(n)), random_vector(rng, side(n))
+    return lambda: la.matrix_vector_multiply(A, v)
+
+def _matrix_multiply(rng, n):
+    # cubic, so the matrices are only sqrt(n / 10) on a side, which keeps the largest
+    # default size to a few seconds
+    k = max(1, math.isqrt(n // 10))
+    A, B = random_matrix(rng, k, k), random_matrix(rng, k, k)
+    return lambda: la.matrix_multiply(A, B)
+
+def _array_matrix_multiply(rng, n):
+    k = max(1, math.isqrt(n // 10))
+    A, B = la.Matrix(random_matrix(rng, k, k)), la.Matrix(random_matrix(rng, k, k))
+    return lambda: la.matrix_multiply(A, B)
+
+def _system(rng, n):
+    """a well-conditioned sqrt(n / 10) x sqrt(n / 10) matrix (cubic to factor, like
+    matrix_multiply) and a right-hand side"""
+    k = max(1, math.isqrt(n // 10))
+    A = random_matrix(rng, k, k)
+    for i in range(k):
+        A[i][i] += k                                   # diagonally dominant
+    return A, random_vector(rng, k)
+
+def _solve(method, cache):
+    def case(rng, n):
+        A, b = _system(rng, n)
+        if method == "cholesky":
+            A = [[(x + y) / 2 for x, y in zip(row, column)]
+                 for row, column in zip(A, la.transpose(A))]
+        if cache is not None:
+            la.solve(A, b, method, cache)              # factored before the timing starts
+        return lambda: la.solve(A, b, method, cache)
+    return case
+
+def _inverse(rng, n):
+    A, _ = _system(rng, n)
+    return lambda: la.inverse(A, cache=None)
+
+def _determinant(rng, n):
+    A, _ = _system(rng, n)
+    return lambda: la.determinant(A, cache=None)
+
+def _csr_matrix_vector_multiply(rng, n):
+    num_nodes = side(n) * 10
+    edges = {(rng.randrange(num_nodes), rng.randrange(num_nodes)) for _ in range(n)}
+    G = la.CSRMatrix.from_edges(sorted(edges), num_nodes, directed=True)
+    v = random_vector(rng, num_nodes)
+    return lambda: la.matrix_vector_multiply(G, v)
+
+def _statistic(fn, data=random_vector):
+    def case(rng, n):
+        x = data(rng, n)
+        return lambda: fn(x)
+    return case
+
+def _cached_median(rng, n):
+    x = random_vector(rng, n)
+    stats.median(x, version=0)                      # sorted once, into sorted_views
+    return lambda: stats.median(x, version=0)
+
+def _quantile(rng, n):
+    x = random_vector(rng, n)
+    return lambda: stats.quantile(x, 0.9)
+
+def _quantiles(rng, n):
+    x = random_vector(rng, n)
+    return lambda: stats.quantiles(x, [0.01, 0.25, 0.5, 0.75, 0.99])
+
+def _pair_statistic(fn):
+    def case(rng, n):
+        x, y = random_vector(rng, n), random_vector(rng, n)
+        return lambda: fn(x, y)
+    return case
+
+def _table_statistic(fn):
+    def case(rng, n):
+        rows = random_vectors(rng, n // 10, 10)        # n values, as rows of 10 features
+        return lambda: fn(rows)
+    return case
+
+def _summary_case(summary_type, data=random_vector):
+    def case(rng, n):
+        x = data(rng, n)
+        return lambda: summary_type().update_many(x)
+    return case
+
+def _sparse_mode(rng, n):
+    # ids up to 10**12, far more than n of them: mode mustn't size anything by the largest
+    ids = [rng.randrange(10 ** 12) for _ in range(n // 2)] * 2
+    ids = la.np.array(ids, dtype=la.np.int64) if la.np is not None else ids
+    return lambda: stats.mode(ids)
+
+def _top_k(rng, n):
+    x = random_counts(rng, n)
+    return lambda: stats.top_k(stats.MisraGries().update_many(x), 10)
+
+CASES = {
+    **_vector_cases(),
+    "dot(Vector)": _array_dot,
+    "vector_sum(VectorAccumulator)": _compensated_sum,
+    "scalar_multiply": _scalar_multiply,
+    "pairwise_squared_distances": _pairwise_squared_distances,
+    "KDTree": _kd_tree_build,
+    "KDTree.query": _kd_tree_query,
+    "shape": _matrix_case(la.shape),
+    "get_row": _matrix_case(lambda A: la.get_row(A, 0)),
+    "get_column": _get_column,
+    "make_matrix(is_diagonal)": _make_matrix,
+    "LazyMatrix.row": _lazy_matrix,
+    "transpose(DiagonalMatrix)": _diagonal_matrix,
+    "transpose(ConstantMatrix)": _constant_matrix,
+    "transpose": _matrix_case(la.transpose),
+    "matrix_vector_multiply": _matrix_vector_multiply,
+    "matrix_multiply": _matrix_multiply,
+    "matrix_multiply(Matrix)": _array_matrix_multiply,
+    "CSRMatrix.matrix_vector_multiply": _csr_matrix_vector_multiply,
+    "solve(LUDecomposition)": _solve("lu", None),
+    "solve(CholeskyDecomposition)": _solve("cholesky", None),
+    "solve(factor, FactorizationCache)": _solve("lu", la.FactorizationCache()),
+    "inverse": _inverse,
+    "determinant": _determinant,
+    "mean": _statistic(stats.mean),
+    "median": _statistic(stats.median),
+    "median(SortedViewCache)": _cached_median,
+    "quantile": _quantile,
+    "quantiles": _quantiles,
+    "mode": _statistic(stats.mode, random_counts),
+    "mode(sparse ids)": _sparse_mode,
+    "data_range": _statistic(stats.data_range),
+    "variance": _statistic(stats.variance),
+    "standard_deviation": _statistic(stats.standard_deviation),
+    "covariance": _pair_statistic(stats.covariance),
+    "correlation": _pair_statistic(stats.correlation),
+    "covariance_matrix(RunningCovariance)": _table_statistic(stats.covariance_matrix),
+    "correlation_matrix": _table_statistic(stats.correlation_matrix),
+    "bincount": _statistic(stats.bincount, random_counts),
+    "RunningStats": _summary_case(stats.RunningStats),
+    "KLLSketch": _summary_case(stats.KLLSketch),
+    "MisraGries": _summary_case(stats.MisraGries, random_counts),
+    "CountMinSketch": _summary_case(stats.CountMinSketch, random_counts),
+    "top_k": _top_k,
+}
+
+
+def measure(call, repeat):
+    """(best seconds per call, peak bytes allocated during one call)"""
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+    # tracemalloc slows allocation down a lot, so memory gets a run of its own
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def growth(timings):
+    """the slope of log(seconds) against log(n) between the smallest and largest n"""
+    sizes = sorted(timings, key=int)
+    if len(sizes) < 2:
+        return None
+    (n0, t0), (n1, t1) = [(int(n), timings[n]["seconds"]) for n in (sizes[0], sizes[-1])]
+    return math.log(t1 / t0) / math.log(n1 / n0)
+
+
+def run(names, sizes, repeat=3, seed=0, out=sys.stdout):
+    """{name: {str(n): {"seconds": ..., "peak_bytes": ...}}} for every case and size"""
+    results = {}
+    print(f"{'case':<40}{'n':>10}{'time (ms)':>12}{'peak (KB)':>12}{'growth':>8}", file=out)
+    for name in names:
+        results[name] = {}
+        for n in sizes:
+            call = CASES[name](random.Random(seed), n)
+            seconds, peak = measure(call, repeat)
+            results[name][str(n)] = {"seconds": seconds, "peak_bytes": peak}
+            exponent = growth(results[name]) if n == sizes[-1] else None
+            print(f"{name:<40}{n:>10}{seconds * 1e3:>12.3f}{peak / 1024:>12.1f}"
+                  + (f"{exponent:>8.2f}" if exponent is not None else ""), file=out)
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds=1e-5):
+    """regressions of results against baseline, as messages: anything more than
+    `threshold` (a fraction) slower or more memory-hungry than it was. Calls faster than
+    min_seconds in both runs are too noisy to compare on time."""
+    regressions = []
+    for name, timings in results.items():
+        for n, now in timings.items():
+            before = baseline.get(name, {}).get(n)
+            if before is None:
+                continue
+            if (max(now["seconds"], before["seconds"]) >= min_seconds
+                    and now["seconds"] > before["seconds"] * (1 + threshold)):
+                regressions.append(f"{name} (n={n}): {before['seconds'] * 1e3:.3f} ms -> "
+                                   f"{now['seconds'] * 1e3:.3f} ms")
+            if now["peak_bytes"] > before["peak_bytes"] * (1 + threshold) + 1024:
+                regressions.append(f"{name} (n={n}): peak {before['peak_bytes']:,} B -> "
+                                   f"{now['peak_bytes']:,} B")
+    return regressions
+
+
+def untested():
+    """public functions and classes of ch4/ch5 that no case covers"""
+    covered = {word for name in CASES for word in re.findall(r"\w+", name)}
+    missing = []
+    for module in (la, stats):
+        for name, value in vars(module).items():
+            if (not name.startswith("_") and callable(value) and name not in covered
+                    and getattr(value, "__module__", None) == module.__name__):
+                missing.append(f"{module.__name__}.{name}")
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m function_tools.bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--only", nargs="+", metavar="PATTERN",
+                        help="run only the cases matching these (fnmatch) patterns")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown / memory growth, as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES
+             if not args.only or any(fnmatch.fnmatch(name, pattern) for pattern in args.only)]
+    if not names:
+        parser.error("no case matches --only")
+    la._load_numpy()
+    results = run(names, sorted(args.sizes), args.repeat, args.seed)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": la.np.__version__ if la.np is not None else None,
+        "sizes": sorted(args.sizes),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for name in untested():
+        print(f"not benchmarked: {name}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print("REGRESSION:", regression)
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
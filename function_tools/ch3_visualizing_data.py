@@ -13,7 +13,14 @@
 # maintains an internal state in which you build up a visualization step by step. Once you’re
 # done, you can save it (with savefig()) or display it (with show()).
 
-from matplotlib import pyplot as plt
+# Importing pyplot takes the better part of a second, which a program that never ends up
+# drawing anything shouldn't have to pay, so we import it the first time it's asked for:
+def pyplot():
+    """matplotlib.pyplot, imported on first use"""
+    from matplotlib import pyplot as plt
+    return plt
+
+# plt = pyplot()
 # years = [1950, 1960, 1970, 1980, 1990, 2000, 2010]
 # gdp = [300.2, 543.3, 1075.9, 2862.5, 5979.6, 10289.7, 14958.3]
 # # create a line chart, years on x-axis, gdp on y-axis
@@ -119,6 +126,341 @@ from matplotlib import pyplot as plt
 # plt.show()
 
 
+
+# # Too many points
+# # plt.scatter draws every point as its own marker, and plt.bar after a Counter looks at
+# # every value from Python. That's fine for nine friends, but with ten million points it
+# # takes minutes and gigabytes, to draw a picture that only has 400 x 300 pixels anyway.
+# # So we count first and draw the counts: density_grid bins the points into a
+# # width x height grid (the way datashader does) and histogram bins values into `bins`
+# # buckets, a chunk of points at a time, so the work is linear in the number of points,
+# # the memory is bounded, and what matplotlib gets to draw depends only on the resolution.
+
+# xs = [random.gauss(0, 1) for _ in range(10_000_000)]
+# ys = [x + random.gauss(0, 0.5) for x in xs]
+# plot_density(xs, ys, width=400, height=300)           # instead of plt.scatter(xs, ys)
+# plot_histogram(grades, bins=10, range=(0, 100))       # instead of the Counter of deciles
+# plt.show()
+
+from array import array
+import builtins
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+from ._arrays import load_numpy
+
+_CHUNK = 1 << 20                                        # points binned at a time
+
+def _extent(values, given):
+    """(lo, hi) to bin values over: given, or their smallest and largest"""
+    np = load_numpy()
+    if given is not None:
+        lo, hi = given
+    elif np is not None and isinstance(values, np.ndarray):
+        lo, hi = values.min(), values.max()             # (not a Python loop over the array)
+    else:
+        lo, hi = min(values), max(values)
+    if lo == hi:                                        # one value: give it a bin of width 1
+        lo, hi = lo - 0.5, hi + 0.5
+    return float(lo), float(hi)
+
+def _bin_index(v, lo, hi, n):
+    """the bin of v among n equal bins from lo to hi (hi goes in the last), or -1 if outside"""
+    if not lo <= v <= hi:
+        return -1
+    return min(int((v - lo) * n / (hi - lo)), n - 1)
+
+def histogram(values, bins=10, range=None):
+    """(counts, edges): how many values fall in each of `bins` equal-width bins between
+    range[0] and range[1] (default: the smallest and largest value); values outside the
+    range aren't counted, and the last bin includes its upper edge"""
+    lo, hi = _extent(values, range)
+    range = builtins.range                              # (the argument hides the builtin)
+    edges = [lo + (hi - lo) * i / bins for i in range(bins)] + [hi]
+    np = load_numpy()
+    if np is not None:
+        counts = np.zeros(bins, dtype=np.int64)
+        for start in range(0, len(values), _CHUNK):
+            chunk = np.asarray(values[start:start + _CHUNK], dtype=np.float64)
+            counts += np.histogram(chunk, bins=bins, range=(lo, hi))[0]
+        return counts.tolist(), edges
+    counts = [0] * bins
+    for v in values:
+        i = _bin_index(v, lo, hi, bins)
+        if i >= 0:
+            counts[i] += 1
+    return counts, edges
+
+def density_grid(xs, ys, width=400, height=300, x_range=None, y_range=None):
+    """(grid, extent): grid[row][col] counts the points (x, y) that fall in each cell of a
+    width x height grid over x_range x y_range (default: the points' bounding box), with
+    row 0 at the bottom; extent is (x_lo, x_hi, y_lo, y_hi), as imshow wants it"""
+    if len(xs) != len(ys):
+        raise ValueError(f"xs and ys have different lengths ({len(xs)} and {len(ys)})")
+    x_lo, x_hi = _extent(xs, x_range)
+    y_lo, y_hi = _extent(ys, y_range)
+    np = load_numpy()
+    if np is not None:
+        x_scale, y_scale = width / (x_hi - x_lo), height / (y_hi - y_lo)
+        counts = np.zeros(width * height, dtype=np.int64)
+        for start in range(0, len(xs), _CHUNK):
+            x = np.asarray(xs[start:start + _CHUNK], dtype=np.float64)
+            y = np.asarray(ys[start:start + _CHUNK], dtype=np.float64)
+            inside = (x >= x_lo) & (x <= x_hi) & (y >= y_lo) & (y <= y_hi)
+            col = np.minimum(((x[inside] - x_lo) * x_scale).astype(np.int64), width - 1)
+            row = np.minimum(((y[inside] - y_lo) * y_scale).astype(np.int64), height - 1)
+            counts += np.bincount(row * width + col, minlength=width * height)
+        return counts.reshape(height, width), (x_lo, x_hi, y_lo, y_hi)
+    grid = [[0] * width for _ in range(height)]
+    for x, y in zip(xs, ys):
+        col, row = _bin_index(x, x_lo, x_hi, width), _bin_index(y, y_lo, y_hi, height)
+        if col >= 0 and row >= 0:
+            grid[row][col] += 1
+    return grid, (x_lo, x_hi, y_lo, y_hi)
+
+def plot_density(xs, ys, width=400, height=300, x_range=None, y_range=None, ax=None,
+                 cmap="viridis", log=True):
+    """draws the density_grid of the points as an image (on ax, default the current axes),
+    shading each cell by log(1 + count) unless log=False; returns the image"""
+    grid, extent = density_grid(xs, ys, width, height, x_range, y_range)
+    np = load_numpy()
+    grid = np.asarray(grid, dtype=np.float64)
+    if log:
+        grid = np.log1p(grid)
+    ax = ax if ax is not None else pyplot().gca()
+    return ax.imshow(grid, origin="lower", extent=extent, aspect="auto", cmap=cmap,
+                     interpolation="nearest")
+
+def plot_histogram(values, bins=10, range=None, ax=None, **bar_options):
+    """draws the histogram of values as bars (on ax, default the current axes); any other
+    keyword arguments go to ax.bar. Returns the bars."""
+    counts, edges = histogram(values, bins, range)
+    widths = [right - left for left, right in zip(edges, edges[1:])]
+    ax = ax if ax is not None else pyplot().gca()
+    return ax.bar(edges[:-1], counts, widths, align="edge", **bar_options)
+
+
+
+# # Too many vertices
+# # A line chart with ten million samples is the same problem: the screen has a thousand or
+# # so pixels across, and plt.plot draws every vertex anyway. Largest-Triangle-Three-Buckets
+# # (Steinarsson, 2013) picks `threshold` of the points that keep the line's shape: it
+# # splits the points into buckets and from each keeps the point that makes the largest
+# # triangle with the point kept from the bucket before and the average of the bucket after,
+# # so peaks and dips survive where every-nth-point sampling would skip them.
+
+# plt.plot(*lttb(years, gdp, 1000), color='green', marker='o', linestyle='solid')
+
+# # And when new samples keep arriving, there's no need to rebuild the figure: a LiveLine
+# # keeps the samples, and on refresh() hands its Line2D the downsampled data in place.
+
+# live = LiveLine(max_points=2000, color='green')
+# live.append(new_times, new_values)                   # as often as data comes in
+# plt.pause(0.1)                                       # redraws just what changed
+
+def lttb(xs, ys, threshold):
+    """(xs, ys) downsampled to `threshold` points by Largest-Triangle-Three-Buckets; the first
+    and last points are always kept, and xs should be increasing"""
+    n = len(xs)
+    if len(ys) != n:
+        raise ValueError(f"xs and ys have different lengths ({n} and {len(ys)})")
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+    np = load_numpy()
+    if np is not None:
+        return _lttb_numpy(np, np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64),
+                           threshold)
+    bounds = _bucket_bounds(n, threshold)
+    kept = [0]
+    a = 0
+    for bucket in range(threshold - 2):
+        start, stop = bounds[bucket], bounds[bucket + 1]
+        # the average of the next bucket (after the last bucket, the last point)
+        next_start, next_stop = (stop, bounds[bucket + 2]) if bucket < threshold - 3 else (n - 1, n)
+        avg_x = sum(xs[next_start:next_stop]) / (next_stop - next_start)
+        avg_y = sum(ys[next_start:next_stop]) / (next_stop - next_start)
+        ax, ay = xs[a], ys[a]
+        a = max(range(start, stop),
+                key=lambda i: abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay)))
+        kept.append(a)
+    kept.append(n - 1)
+    return [xs[i] for i in kept], [ys[i] for i in kept]
+
+def _bucket_bounds(n, threshold):
+    """where each of the threshold - 2 buckets of points 1 .. n - 2 starts, and n - 1"""
+    every = (n - 2) / (threshold - 2)
+    return [int(bucket * every) + 1 for bucket in range(threshold - 2)] + [n - 1]
+
+def _lttb_numpy(np, xs, ys, threshold):
+    n = len(xs)
+    bounds = np.array(_bucket_bounds(n, threshold))
+    # the average point of every bucket (one cumulative sum, not a loop over the points),
+    # with the last point itself as the bucket after the last bucket
+    sum_x, sum_y = np.concatenate(([0.0], np.cumsum(xs))), np.concatenate(([0.0], np.cumsum(ys)))
+    sizes = np.diff(bounds)
+    avg_x = np.append((sum_x[bounds[1:]] - sum_x[bounds[:-1]]) / sizes, xs[-1])
+    avg_y = np.append((sum_y[bounds[1:]] - sum_y[bounds[:-1]]) / sizes, ys[-1])
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, stop = bounds[bucket], bounds[bucket + 1]
+        ax, ay = xs[a], ys[a]
+        area = np.abs((ax - avg_x[bucket + 1]) * (ys[start:stop] - ay)
+                      - (ax - xs[start:stop]) * (avg_y[bucket + 1] - ay))
+        a = start + int(area.argmax())
+        kept[bucket + 1] = a
+    return xs[kept].tolist(), ys[kept].tolist()
+
+
+class LiveLine:
+    """a line on a chart that new samples can be appended to; the chart shows at most
+    max_points of them (downsampled with lttb), updated in place on refresh()"""
+
+    def __init__(self, ax=None, max_points=2000, autoscale=True, **line_options):
+        self.ax = ax if ax is not None else pyplot().gca()
+        self.max_points = max_points
+        self.autoscale = autoscale
+        self.xs, self.ys = array("d"), array("d")     # every sample, growing in place
+        self.line, = self.ax.plot([], [], **line_options)
+        self._shown = 0                                 # len(xs) at the last refresh
+
+    def append(self, xs, ys, refresh=True):
+        """adds samples (xs increasing, and after the ones already there)"""
+        if len(xs) != len(ys):
+            raise ValueError(f"xs and ys have different lengths ({len(xs)} and {len(ys)})")
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        if refresh:
+            self.refresh()
+
+    def refresh(self):
+        """hands the line its (downsampled) data and asks for a redraw, if anything changed"""
+        if len(self.xs) == self._shown:
+            return
+        self._shown = len(self.xs)
+        np = load_numpy()
+        xs, ys = self.xs, self.ys
+        if np is not None:                              # views of the arrays, not copies
+            xs, ys = np.frombuffer(xs, dtype=np.float64), np.frombuffer(ys, dtype=np.float64)
+        self.line.set_data(*lttb(xs, ys, self.max_points))
+        if self.autoscale:
+            self.ax.relim()
+            self.ax.autoscale_view()
+        self.ax.figure.canvas.draw_idle()
+
+    def __len__(self):
+        return len(self.xs)
+
+
+
+# # Lots of charts
+# # pyplot's "current figure" is global state: two threads drawing at once draw on each
+# # other's charts, and every plt.figure() stays alive until someone closes it. For a batch
+# # of charts we skip pyplot and use the objects underneath it: a Figure with an Agg
+# # (non-interactive, PNG-rendering) canvas, cleared and reused for one chart after another.
+# # Each chart is described by a spec, a dict with the same pieces as the recipes above:
+
+# export_charts([
+#     {"kind": "line", "path": "gdp.png", "x": years, "y": gdp, "title": "Nominal GDP",
+#      "ylabel": "Billions of $", "style": {"color": "green", "marker": "o"}},
+#     {"kind": "bar", "path": "oscars.svg", "x": movies, "y": num_oscars,
+#      "title": "My Favorite Movies", "ylabel": "# of Academy Awards"},
+#     {"kind": "histogram", "path": "grades.png", "values": grades, "bins": 10,
+#      "range": (0, 100), "xlabel": "Decile", "ylabel": "# of Students"},
+#     {"kind": "line", "path": "tradeoff.png", "legend": 9, "series": [
+#         {"x": xs, "y": variance, "fmt": "g-", "label": "variance"},
+#         {"x": xs, "y": bias_squared, "fmt": "r-.", "label": "bias^2"}]},
+#     {"kind": "scatter", "path": "friends.png", "x": friends, "y": minutes,
+#      "labels": labels, "axis": "equal"},
+# ], workers=8)
+
+ChartExport = namedtuple("ChartExport", "charts seconds charts_per_second failures")
+
+def _draw(ax, spec):
+    kind = spec["kind"]
+    series = spec.get("series") or [spec]
+    for s in series:
+        style = s.get("style", {})
+        if kind == "line":
+            ax.plot(s["x"], s["y"], *([s["fmt"]] if "fmt" in s else []),
+                    label=s.get("label"), **style)
+        elif kind == "bar":
+            positions = range(len(s["x"]))
+            ax.bar(positions, s["y"], label=s.get("label"), **style)
+            ax.set_xticks(positions, [str(x) for x in s["x"]])
+        elif kind == "histogram":
+            plot_histogram(s["values"], s.get("bins", 10), s.get("range"), ax=ax,
+                           label=s.get("label"), **style)
+        elif kind == "scatter":
+            ax.scatter(s["x"], s["y"], label=s.get("label"), **style)
+            for label, x, y in zip(s.get("labels", ()), s["x"], s["y"]):
+                ax.annotate(label, xy=(x, y), xytext=(5, -5), textcoords="offset points")
+        else:
+            raise ValueError(f"unknown chart kind {kind!r}")
+
+def render_chart(spec, figure=None):
+    """draws the chart spec describes on figure (cleared first; default a new one) and saves
+    it to spec["path"], as PNG or SVG or whatever its extension says; returns the figure"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    if figure is None:
+        figure = Figure()
+        FigureCanvasAgg(figure)
+    # (new axes each time: cleared axes would keep settings like an equal aspect ratio)
+    figure.clear()
+    figure.set_size_inches(spec.get("size", (6.4, 4.8)))
+    ax = figure.add_subplot()
+    _draw(ax, spec)
+    if "title" in spec:
+        ax.set_title(spec["title"])
+    if "xlabel" in spec:
+        ax.set_xlabel(spec["xlabel"])
+    if "ylabel" in spec:
+        ax.set_ylabel(spec["ylabel"])
+    if "xticks" in spec:
+        ax.set_xticks(spec["xticks"], *([spec["xticklabels"]] if "xticklabels" in spec else []))
+    if "axis" in spec:
+        ax.axis(spec["axis"])
+    if "legend" in spec:
+        ax.legend(loc=spec["legend"])
+    figure.savefig(spec["path"], dpi=spec.get("dpi", 100))
+    return figure
+
+_figure = None                                          # this process's reusable figure
+
+def _render_batch(specs):
+    """renders specs on this process's figure; returns (path, error) for those that failed"""
+    global _figure
+    failures = []
+    for spec in specs:
+        try:
+            _figure = render_chart(spec, _figure)
+        except Exception as e:                          # one bad chart shouldn't sink the batch
+            failures.append((spec.get("path"), f"{type(e).__name__}: {e}"))
+    return failures
+
+def export_charts(specs, workers=None, batch_size=16):
+    """renders every spec (see render_chart) in a pool of `workers` processes (default: one
+    per CPU; 1 renders in this process), batch_size charts per task; returns a ChartExport
+    with how many charts were rendered, how long it took and which failed"""
+    specs = list(specs)
+    workers = workers or os.cpu_count() or 1
+    batches = [specs[i:i + batch_size] for i in range(0, len(specs), batch_size)]
+    start = time.perf_counter()
+    if workers == 1 or len(batches) <= 1:
+        results = map(_render_batch, batches)
+        failures = [failure for result in results for failure in result]
+    else:
+        with ProcessPoolExecutor(min(workers, len(batches))) as pool:
+            failures = [failure for result in pool.map(_render_batch, batches) for failure in result]
+    seconds = time.perf_counter() - start
+    rendered = len(specs) - len(failures)
+    return ChartExport(rendered, seconds, rendered / seconds if seconds else 0.0, failures)
+
+
 # For Further Exploration
 # seaborn is built on top of matplotlib and allows you to easily produce prettier (and
 # more complex) visualizations.
@@ -16,13 +16,14 @@
 # The simplest from-scratch approach is to represent vectors as lists of numbers. A list of
 # three numbers corresponds to a vector in three-dimensional space, and vice versa:
 
-height_weight_age = [70,        # inches,
-                        170,    # pounds,
-                        40 ]    # years
-grades = [95, # exam1
-            80,                 # exam2
-            75,                 # exam3
-            62 ]                # exam4
+if __name__ == "__main__":
+    height_weight_age = [70,        # inches,
+                            170,    # pounds,
+                            40 ]    # years
+    grades = [95, # exam1
+                80,                 # exam2
+                75,                 # exam3
+                62 ]                # exam4
 
 
 # One problem with this approach is that we will want to perform arithmetic on vectors.
@@ -38,11 +39,15 @@ grades = [95, # exam1
 
 def vector_add(v, w):
     """adds corresponding elements"""
+    if isinstance(v, Vector) or isinstance(w, Vector):
+        return _array_add(v, w)
     return [v_i + w_i
             for v_i, w_i in zip(v, w)]
 
 def vector_subtract(v, w):
     """subtracts corresponding elements"""
+    if isinstance(v, Vector) or isinstance(w, Vector):
+        return _array_subtract(v, w)
     return [v_i - w_i
             for v_i, w_i in zip(v, w)]
 
@@ -68,19 +73,136 @@ vector_sum = partial(reduce, vector_add)
 # multiplying each element of the vector by that number:
 def scalar_multiply(c, v):
     """c is a number, v is a vector"""
+    if isinstance(v, Vector):
+        return _array_scale(c, v)
     return [c * v_i for v_i in v]
 
-# This allows us to compute the componentwise means of a list of (same-sized) vectors:
-def vector_mean(vectors):
+# Folding with vector_add builds a new list for every vector it adds, though, and it only
+# makes sense if we can hold all the vectors at once. For a stream of rows (read from disk,
+# say) it's better to keep one running total and add each vector into it in place, which
+# takes memory for one vector no matter how many rows go by. Floating-point sums of
+# millions of rows also drift, so the accumulator can optionally carry a (Neumaier)
+# correction term per component, and two accumulators over different chunks of the data
+# can be merged:
+class VectorAccumulator:
+    """running componentwise sum and count of a stream of same-sized vectors"""
+
+    def __init__(self, compensated=False):
+        self.compensated = compensated
+        self.count = 0
+        self.total = None                           # allocated by the first vector
+        self.correction = None                      # low-order bits lost from total
+        self._numpy = False                         # total is a NumPy array
+        self._array_backed = False                  # sum() should return a Vector
+
+    def _start(self, dimension, array_backed):
+        self._array_backed = array_backed
+        if array_backed and np is not None:
+            self._numpy = True
+            self.total = np.zeros(dimension)
+            self.correction = np.zeros(dimension) if self.compensated else None
+        elif array_backed:
+            self.total = array("d", bytes(8 * dimension))
+            self.correction = array("d", bytes(8 * dimension)) if self.compensated else None
+        else:
+            self.total = [0] * dimension            # ints stay ints unless compensated
+            self.correction = [0.0] * dimension if self.compensated else None
+
+    def _add_total(self, v):
+        """adds the components of v into the running total in place"""
+        if len(v) != len(self.total):
+            raise ValueError(f"vectors have different lengths ({len(self.total)} and {len(v)})")
+        total, correction = self.total, self.correction
+        if self._numpy:
+            v = _as_buffer(v)
+            if correction is None:
+                total += v
+            else:
+                t = total + v
+                correction += np.where(np.abs(total) >= np.abs(v), (total - t) + v, (v - t) + total)
+                total[:] = t
+        elif correction is None:
+            for i, v_i in enumerate(v):
+                total[i] += v_i
+        else:
+            for i, v_i in enumerate(v):
+                s = total[i]
+                t = s + v_i
+                if abs(s) >= abs(v_i):
+                    correction[i] += (s - t) + v_i
+                else:
+                    correction[i] += (v_i - t) + s
+                total[i] = t
+
+    def add(self, v):
+        """adds one vector"""
+        if self.total is None:
+            self._start(len(v), isinstance(v, Vector))
+        self._add_total(v)
+        self.count += 1
+
+    def add_many(self, vectors):
+        """adds every vector in an iterable (or the rows of a Matrix)"""
+        if isinstance(vectors, Matrix) and np is not None:
+            if self.total is None:
+                self._start(vectors.shape[1], True)
+            if len(vectors):
+                self._add_total(vectors.data.sum(axis=0))   # NumPy sums pairwise
+            self.count += len(vectors)
+        else:
+            for v in vectors:
+                self.add(v)
+
+    def merge(self, other):
+        """folds in the sum and count of another accumulator (over other rows)"""
+        if other.total is None:
+            return
+        if self.total is None:
+            self._start(len(other.total), other._array_backed)
+        self._add_total(other.total)
+        if other.correction is not None:
+            self._add_total(other.correction)
+        self.count += other.count
+
+    def sum(self):
+        if self.total is None:
+            raise ValueError("no vectors to sum")
+        if self.correction is not None:
+            result = [s + c for s, c in zip(self.total, self.correction)]
+        else:
+            result = list(self.total)
+        return Vector(result) if self._array_backed else result
+
+    def mean(self):
+        return scalar_multiply(1 / self.count, self.sum())
+
+
+def _accumulate(vectors, compensated, chunked):
+    accumulator = VectorAccumulator(compensated)
+    if chunked:
+        for chunk in vectors:
+            accumulator.add_many(chunk)
+    else:
+        accumulator.add_many(vectors)
+    return accumulator
+
+def vector_sum(vectors, compensated=False, chunked=False):
+    """sums all corresponding elements of an iterable of vectors
+    (or of an iterable of chunks of vectors, if chunked=True)"""
+    return _accumulate(vectors, compensated, chunked).sum()
+
+# This allows us to compute the componentwise means of a stream of (same-sized) vectors:
+def vector_mean(vectors, compensated=False, chunked=False):
     """compute the vector whose ith element is the mean of the
     ith elements of the input vectors"""
-    n = len(vectors)
-    return scalar_multiply(1/n, vector_sum(vectors))
+    return _accumulate(vectors, compensated, chunked).mean()
 
 # A less obvious tool is the dot product. The dot product of two vectors is the sum of their
 # componentwise products:
 def dot(v, w):
     """v_1 * w_1 + ... + v_n * w_n"""
+    if isinstance(v, Vector) or isinstance(w, Vector):
+        return _array_dot(v, w)
     return sum(v_i * w_i
                 for v_i, w_i in zip(v, w))
 # The dot product measures how far the vector v extends in the w direction. For example, if
@@ -114,20 +236,130 @@ def distance(v, w):
     return magnitude(vector_subtract(v, w))
 
 
+# Both versions build a temporary vector (and take a square root) for every pair of points,
+# which adds up when we want the distances between every point of one set and every point
+# of another. Since ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b, we can compute each point's
+# squared norm once and get all the cross terms from a single matrix product:
+def pairwise_squared_distances(A, B):
+    """the len(A) x len(B) matrix whose (i,j)th entry is squared_distance(A[i], B[j])
+    (rounding can make the expansion slightly negative, so it's clipped at 0)"""
+    if isinstance(A, Matrix) or isinstance(B, Matrix):
+        if np is not None:
+            A, B = Matrix(A).data, Matrix(B).data
+            squares = (A * A).sum(axis=1)[:, None] + (B * B).sum(axis=1)[None, :] - 2 * (A @ B.T)
+            return Matrix(np.maximum(squares, 0.0))
+        return Matrix(pairwise_squared_distances(_rows_of(A), _rows_of(B)))
+    A_norms = [dot(a, a) for a in A]
+    B_norms = [dot(b, b) for b in B]
+    cross = matrix_multiply(A, transpose(B)) if A and B else [[] for _ in A]
+    return [[max(a_norm + b_norm - 2 * a_dot_b, 0) for b_norm, a_dot_b in zip(B_norms, cross_row)]
+            for a_norm, cross_row in zip(A_norms, cross)]
+
+
+# Even so, finding the nearest neighbors of a point that way means measuring the distance to
+# every point there is. A k-d tree splits the points in half along one coordinate, then
+# splits each half along another coordinate, and so on, until every group is small. A query
+# only has to look inside the groups whose bounding split could contain something closer
+# than what it has already found.
+
+import heapq
+
+class KDTree:
+    """an index over a fixed set of points for nearest-neighbor and radius queries"""
+
+    def __init__(self, points, leaf_size=16):
+        self.points = [tuple(point) for point in points]
+        self.leaf_size = leaf_size
+        self.index = list(range(len(self.points)))  # points, reordered group by group
+        self.nodes = []                             # [start, end, dim, split, left, right]
+        if self.points:
+            self._build()
+
+    def _build(self):
+        points, index = self.points, self.index
+        dimension = len(points[0])
+        self.nodes.append([0, len(points), None, None, None, None])
+        stack = [0]
+        while stack:
+            node = self.nodes[stack.pop()]
+            start, end = node[0], node[1]
+            if end - start <= self.leaf_size:
+                continue                            # a leaf: searched point by point
+            # split along the coordinate in which this group is most spread out
+            spreads = [max(points[i][d] for i in index[start:end]) -
+                       min(points[i][d] for i in index[start:end]) for d in range(dimension)]
+            dim = spreads.index(max(spreads))
+            if spreads[dim] == 0:
+                continue                            # all the same point, nothing to split
+            index[start:end] = sorted(index[start:end], key=lambda i: points[i][dim])
+            mid = (start + end) // 2
+            node[2], node[3] = dim, points[index[mid]][dim]
+            node[4], node[5] = len(self.nodes), len(self.nodes) + 1
+            self.nodes.append([start, mid, None, None, None, None])
+            self.nodes.append([mid, end, None, None, None, None])
+            stack += [node[4], node[5]]
+
+    def _search(self, point, within):
+        """visits the leaves that could hold a point closer than within(), nearest side first,
+        yielding the index of and distance to every point in them"""
+        points, index, nodes = self.points, self.index, self.nodes
+        stack = [(0, 0.0)] if nodes else []         # (node, lower bound on its distance)
+        while stack:
+            node_id, bound = stack.pop()
+            if bound > within():
+                continue
+            start, end, dim, split, left, right = nodes[node_id]
+            if left is None:
+                for i in index[start:end]:
+                    yield i, math.dist(points[i], point)
+                continue
+            diff = point[dim] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, max(bound, abs(diff))))
+            stack.append((near, bound))
+
+    def query(self, point, k=1):
+        """the k points nearest to point, as (distance, index) pairs, nearest first"""
+        if k <= 0:
+            return []                               # (like heapq.nsmallest)
+        nearest = []                                # max-heap of (-distance, index)
+        within = lambda: -nearest[0][0] if len(nearest) == k else math.inf
+        for i, d in self._search(point, within):
+            if len(nearest) < k:
+                heapq.heappush(nearest, (-d, i))
+            elif d < -nearest[0][0]:
+                heapq.heapreplace(nearest, (-d, i))
+        return sorted((-neg_d, i) for neg_d, i in nearest)
+
+    def query_radius(self, point, r):
+        """the points within distance r of point, as (distance, index) pairs, nearest first"""
+        return sorted((d, i) for i, d in self._search(point, lambda: r) if d <= r)
+
+
 # Matrix
 # A matrix is a two-dimensional collection of numbers. We will represent matrices as lists
 # of lists, with each inner list having the same size and representing a row of the matrix. If
 # A is a matrix, then A[i][j] is the element in the ith row and the jth column.
 
-A = [[1, 2, 3],     # A has 2 rows and 3 columns
-    [4, 5, 6]]
-B = [[1, 2],        # B has 3 rows and 2 columns
-    [3, 4],
-    [5, 6]]
+if __name__ == "__main__":
+    A = [[1, 2, 3],     # A has 2 rows and 3 columns
+        [4, 5, 6]]
+    B = [[1, 2],        # B has 3 rows and 2 columns
+        [3, 4],
+        [5, 6]]
 
 # Given this list-of-lists representation, the matrix A has len(A) rows and len(A[0])
 # columns, which we consider its shape:
+import sys
+
+def _is_columnar(A):
+    """True if A is a columnar.ColumnarDataset (if it were, that module would be imported)"""
+    columnar = sys.modules.get(f"{__package__}.columnar")
+    return columnar is not None and isinstance(A, columnar.ColumnarDataset)
+
 def shape(A):
+    if isinstance(A, (Matrix, CSRMatrix, LazyMatrix)) or _is_columnar(A):
+        return A.shape
     num_rows = len(A)
     num_cols = len(A[0]) if A else 0 # number of elements in first row
     return num_rows, num_cols
@@ -139,15 +371,22 @@ def shape(A):
 def get_row(A, i):
     return A[i]                 # A[i] is already the ith row
 def get_column(A, j):
+    if isinstance(A, (Matrix, CSRMatrix, LazyMatrix)) or _is_columnar(A):
+        return A.column(j)
     return [A_i[j]              # jth element of row A_i
             for A_i in A]       # for each row A_i
 
 
 # We’ll also want to be able to create a matrix given its shape and a function for generating
 # its elements. We can do this using a nested list comprehension:
-def make_matrix(num_rows, num_cols, entry_fn):
+def make_matrix(num_rows, num_cols, entry_fn, lazy=False, cache_rows=128):
     """returns a num_rows x num_cols matrix
-    whose (i,j)th entry is entry_fn(i, j)"""
+    whose (i,j)th entry is entry_fn(i, j)
+    (with lazy=True, a LazyMatrix that only calls entry_fn when asked)"""
+    if lazy:
+        if entry_fn is is_diagonal and num_rows == num_cols:
+            return DiagonalMatrix(num_rows)         # the identity, in O(1) space
+        return LazyMatrix(num_rows, num_cols, entry_fn, cache_rows)
     return [[entry_fn(i, j)                 # given i, create a list
     for j in range(num_cols)]               # [entry_fn(i, 0), ... ]
     for i in range(num_rows)]               # create one list for each i
@@ -156,7 +395,215 @@ def is_diagonal(i, j):
     """1's on the 'diagonal', 0's everywhere else"""
     return 1 if i == j else 0
 
-make_matrix(3,3,is_diagonal)
+if __name__ == "__main__":
+    make_matrix(3,3,is_diagonal)
+
+
+# Building every entry up front means make_matrix(n, n, is_diagonal) stores n * n boxed 0s
+# and 1s to say something that takes one number, and a matrix computed from a kernel function
+# might not fit in memory at all. A lazy matrix just remembers entry_fn and calls it when an
+# entry is asked for, keeping the most recently used rows around in case they're asked for
+# again. Matrices whose structure we know (diagonal, constant) don't need entry_fn at all.
+
+from collections import OrderedDict
+
+def _check_index(i, size):
+    """i as a position in range(size), counting negative ones from the end like a list"""
+    if i < 0:
+        i += size
+    if not 0 <= i < size:
+        raise IndexError("matrix index out of range")
+    return i
+
+class LazyMatrix:
+    """a num_rows x num_cols matrix whose (i,j)th entry is entry_fn(i, j), computed on demand;
+    the last cache_rows rows computed are kept (as tuples) in an LRU cache"""
+
+    def __init__(self, num_rows, num_cols, entry_fn, cache_rows=128):
+        self.shape = (num_rows, num_cols)
+        self.entry_fn = entry_fn
+        self.cache_rows = cache_rows
+        self._rows = OrderedDict()                  # i -> row i, least recently used first
+
+    def entry(self, i, j):
+        i, j = _check_index(i, self.shape[0]), _check_index(j, self.shape[1])
+        row = self._rows.get(i)
+        return row[j] if row is not None else self.entry_fn(i, j)
+
+    def row(self, i):
+        i = _check_index(i, self.shape[0])
+        row = self._rows.get(i)
+        if row is not None:
+            self._rows.move_to_end(i)
+            return row
+        row = self._compute_row(i)
+        if self.cache_rows:
+            self._rows[i] = row
+            if len(self._rows) > self.cache_rows:
+                self._rows.popitem(last=False)      # evict the least recently used row
+        return row
+
+    def _compute_row(self, i):
+        return tuple(self.entry_fn(i, j) for j in range(self.shape[1]))
+
+    def column(self, j):
+        return [self.entry(i, j) for i in range(self.shape[0])]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return self.entry(*index)
+        return self.row(index)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.shape[0]))
+
+    def to_dense(self):
+        """the list-of-lists version of the matrix"""
+        return [list(row) for row in self]
+
+    def __repr__(self):
+        return f"{type(self).__name__}(shape={self.shape})"
+
+
+class DiagonalMatrix(LazyMatrix):
+    """an n x n matrix that is 0 off the diagonal; diagonal is either one number for every
+    diagonal entry (O(1) space, 1 gives the identity) or a sequence of n of them (O(n))"""
+
+    def __init__(self, n, diagonal=1):
+        if not isinstance(diagonal, (int, float)) and len(diagonal) != n:
+            raise ValueError(f"a {n}x{n} diagonal matrix needs {n} diagonal entries")
+        super().__init__(n, n, self._diagonal_entry, cache_rows=0)
+        self.diagonal = diagonal
+
+    def _diagonal_value(self, i):
+        return self.diagonal if isinstance(self.diagonal, (int, float)) else self.diagonal[i]
+
+    def _diagonal_entry(self, i, j):
+        return self._diagonal_value(i) if i == j else 0
+
+    def _compute_row(self, i):
+        row = [0] * self.shape[1]
+        row[i] = self._diagonal_value(i)
+        return tuple(row)
+
+    def column(self, j):
+        j = _check_index(j, self.shape[1])
+        return list(self._compute_row(j))           # the matrix is symmetric
+
+
+class ConstantMatrix(LazyMatrix):
+    """a num_rows x num_cols matrix with every entry equal to value, in O(1) space"""
+
+    def __init__(self, num_rows, num_cols, value):
+        super().__init__(num_rows, num_cols, lambda i, j: value, cache_rows=0)
+        self.value = value
+
+    def _compute_row(self, i):
+        return (self.value,) * self.shape[1]
+
+    def column(self, j):
+        _check_index(j, self.shape[1])
+        return [self.value] * self.shape[0]
+
+
+if __name__ == "__main__":
+    identity = make_matrix(1_000_000, 1_000_000, is_diagonal, lazy=True)   # no 10^12 entries
+    identity[2, 2], identity[2, 3]                                           # (1, 0)
+
+
+# Matrix products
+# The (i,j)th entry of the product of an n x k matrix A and a k x m matrix B is
+# dot(get_row(A, i), get_column(B, j)). Written that way, though, every one of the n * m
+# output cells pays for a get_column, which walks all k rows of B. Instead we transpose B
+# once up front, so that its columns become rows we can zip against, and fill the output
+# one tile of columns at a time, so the same few columns of B are reused for every row
+# before we move on to the next tile.
+
+def transpose(A):
+    """the num_cols x num_rows matrix whose (j,i)th entry is A[i][j]"""
+    if isinstance(A, CSRMatrix):
+        return A.transpose()
+    if isinstance(A, Matrix):
+        if np is not None:
+            return Matrix(np.ascontiguousarray(A.data.T))
+        num_rows, num_cols = A.shape
+        data = array("d")
+        for j in range(num_cols):
+            data.extend(A.data[j::num_cols])        # column j becomes row j
+        return Matrix._wrap(data, (num_cols, num_rows))
+    return [list(column) for column in zip(*A)]
+
+def _rows_of(A):
+    """A as a list of plain rows (what the pure-Python products loop over)"""
+    if isinstance(A, Matrix):
+        return A.tolist()
+    if isinstance(A, (CSRMatrix, LazyMatrix)):
+        return A.to_dense()
+    return A
+
+def matrix_vector_multiply(A, v):
+    """the vector whose ith element is dot(get_row(A, i), v)"""
+    if isinstance(A, CSRMatrix):
+        return A.matrix_vector_multiply(v)
+    num_rows, num_cols = shape(A)
+    if num_cols != len(v):
+        raise ValueError(f"can't multiply a {num_rows}x{num_cols} matrix by a vector of length {len(v)}")
+    if isinstance(A, Matrix) or isinstance(v, Vector):
+        if np is not None:
+            return Vector(Matrix(A).data @ _as_buffer(v))
+        return Vector(array("d", (sum(map(operator.mul, row, v)) for row in _rows_of(A))))
+    return [sum(map(operator.mul, row, v)) for row in A]
+
+def _multiply_rows(rows, columns, block_size):
+    """the rows of rows x (the matrix whose columns are `columns`), tile by tile"""
+    out = [[0] * len(columns) for _ in rows]
+    for j0 in range(0, len(columns), block_size):
+        column_tile = columns[j0:j0 + block_size]
+        for row, out_row in zip(rows, out):
+            for j, column in enumerate(column_tile, j0):
+                out_row[j] = sum(map(operator.mul, row, column))
+    return out
+
+# Worker processes get the transposed B once, when the pool starts, rather than once per
+# block of rows.
+_pool_columns = None
+
+def _init_pool_columns(columns):
+    global _pool_columns
+    _pool_columns = columns
+
+def _multiply_pool_rows(rows, block_size):
+    return _multiply_rows(rows, _pool_columns, block_size)
+
+def matrix_multiply(A, B, block_size=64, workers=None):
+    """the n x m product of an n x k matrix A and a k x m matrix B
+    workers=N splits the output into blocks of rows computed by N processes
+    (array-backed matrices go straight to NumPy, which is already multithreaded)"""
+    num_rows, num_shared = shape(A)
+    num_inner, num_cols = shape(B)
+    if num_shared != num_inner:
+        raise ValueError(f"can't multiply a {num_rows}x{num_shared} matrix "
+                         f"by a {num_inner}x{num_cols} matrix")
+    array_backed = isinstance(A, Matrix) or isinstance(B, Matrix)
+    if array_backed and np is not None:
+        return Matrix(Matrix(A).data @ Matrix(B).data)
+    rows = _rows_of(A)
+    columns = _rows_of(transpose(B))
+    if workers and workers > 1 and num_rows > block_size:
+        from concurrent.futures import ProcessPoolExecutor
+        step = max(block_size, -(-num_rows // (4 * workers)))   # a few blocks per worker
+        with ProcessPoolExecutor(workers, initializer=_init_pool_columns,
+                                 initargs=(columns,)) as pool:
+            blocks = pool.map(_multiply_pool_rows,
+                              [rows[i:i + step] for i in range(0, num_rows, step)],
+                              repeat(block_size))
+            out = [out_row for block in blocks for out_row in block]
+    else:
+        out = _multiply_rows(rows, columns, block_size)
+    return Matrix(out) if array_backed else out
 
 
 # Matrices will be important to us for several reasons.
@@ -164,11 +611,12 @@ make_matrix(3,3,is_diagonal)
 # considering each vector as a row of the matrix.
 
 # heights, weights, and ages of 1,000 people you could put them in a matrix:
-data = [[70, 170, 40],
-        [65, 120, 26],
-        [77, 250, 19],
-        # ....
-        ]
+if __name__ == "__main__":
+    data = [[70, 170, 40],
+            [65, 120, 26],
+            [77, 250, 19],
+            # ....
+            ]
 
 # Second, as we’ll see later, we can use an matrix to represent a linear function that
 # maps k-dimensional vectors to n-dimensional vectors.
@@ -178,31 +626,674 @@ data = [[70, 170, 40],
 # be to create a matrix A such that A[i][j] is 1 if nodes i and j are connected and 0
 # otherwise.
 # Recall that before we had:
-friendships = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (3, 4),
-                (4, 5), (5, 6), (5, 7), (6, 8), (7, 8), (8, 9)]
-
-# We could also represent this as:
-# user 0 1 2 3 4 5 6 7 8 9
-#
-friendships = [[0, 1, 1, 0, 0, 0, 0, 0, 0, 0],              # user 0
-                [1, 0, 1, 1, 0, 0, 0, 0, 0, 0],             # user 1
-                [1, 1, 0, 1, 0, 0, 0, 0, 0, 0],             # user 2
-                [0, 1, 1, 0, 1, 0, 0, 0, 0, 0],             # user 3
-                [0, 0, 0, 1, 0, 1, 0, 0, 0, 0],             # user 4
-                [0, 0, 0, 0, 1, 0, 1, 1, 0, 0],             # user 5
-                [0, 0, 0, 0, 0, 1, 0, 0, 1, 0],             # user 6
-                [0, 0, 0, 0, 0, 1, 0, 0, 1, 0],             # user 7
-                [0, 0, 0, 0, 0, 0, 1, 1, 0, 1],             # user 8
-                [0, 0, 0, 0, 0, 0, 0, 0, 1, 0]]             # user 9
-
-friendships[0][2] == 1                                      # True, 0 and 2 are friends
-friendships[0][8] == 1                                      # False, 0 and 8 are not friends
-
-# Similarly, to find the connections a node has, you only need to inspect the column (or the
-# row) corresponding to that node:
-
-# Similarly, to find the connections a node has, you only need to inspect the column (or the
-# row) corresponding to that node:
-friends_of_five = [i                                                # only need
-                    for i, is_friend in enumerate(friendships[5])   # to look at
-                    if is_friend]                                   # one row
+if __name__ == "__main__":
+    friendships = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (3, 4),
+                    (4, 5), (5, 6), (5, 7), (6, 8), (7, 8), (8, 9)]
+
+    # We could also represent this as:
+    # user 0 1 2 3 4 5 6 7 8 9
+    #
+    friendships = [[0, 1, 1, 0, 0, 0, 0, 0, 0, 0],              # user 0
+                    [1, 0, 1, 1, 0, 0, 0, 0, 0, 0],             # user 1
+                    [1, 1, 0, 1, 0, 0, 0, 0, 0, 0],             # user 2
+                    [0, 1, 1, 0, 1, 0, 0, 0, 0, 0],             # user 3
+                    [0, 0, 0, 1, 0, 1, 0, 0, 0, 0],             # user 4
+                    [0, 0, 0, 0, 1, 0, 1, 1, 0, 0],             # user 5
+                    [0, 0, 0, 0, 0, 1, 0, 0, 1, 0],             # user 6
+                    [0, 0, 0, 0, 0, 1, 0, 0, 1, 0],             # user 7
+                    [0, 0, 0, 0, 0, 0, 1, 1, 0, 1],             # user 8
+                    [0, 0, 0, 0, 0, 0, 0, 0, 1, 0]]             # user 9
+
+    friendships[0][2] == 1                                      # True, 0 and 2 are friends
+    friendships[0][8] == 1                                      # False, 0 and 8 are not friends
+
+    # Similarly, to find the connections a node has, you only need to inspect the column (or the
+    # row) corresponding to that node:
+
+    # Similarly, to find the connections a node has, you only need to inspect the column (or the
+    # row) corresponding to that node:
+    friends_of_five = [i                                                # only need
+                        for i, is_friend in enumerate(friendships[5])   # to look at
+                        if is_friend]                                   # one row
+
+
+# Array-backed vectors and matrices
+# Lists are the clearest way to write the math down, but every number in a list is a
+# separate Python object and every function above builds a brand new list. With vectors of
+# hundreds of thousands of components that per-element overhead is most of the work.
+# Vector and Matrix keep their numbers in one contiguous buffer instead: a NumPy array when
+# NumPy is installed, and an array('d') when it isn't. vector_add, vector_subtract,
+# scalar_multiply, dot (and everything built on it), shape, get_row and get_column accept
+# them in place of lists and hand back Vectors. (NumPy is slow to import, so we only import
+# it when the first array-backed object is made; code that sticks to lists never pays.)
+
+from array import array
+from itertools import repeat
+import operator
+
+from ._arrays import load_numpy
+
+np = None                                           # NumPy, once _load_numpy has run
+
+def _load_numpy():
+    """binds np to NumPy the first time it's needed (if it isn't installed, np stays None
+    and we fall back to array('d') and plain loops)"""
+    global np
+    np = load_numpy()
+
+
+class Vector:
+    """a vector of floats stored in one contiguous buffer
+    (wraps NumPy arrays and array('d') buffers without copying them)"""
+    __slots__ = ("data",)
+
+    def __init__(self, values=()):
+        _load_numpy()
+        if isinstance(values, Vector):
+            values = values.data
+        if np is not None:
+            if not hasattr(values, "__len__"):      # a generator, say
+                values = np.fromiter(values, dtype=float)
+            self.data = np.asarray(values, dtype=float)
+            if self.data.ndim != 1:
+                raise ValueError("a Vector needs one-dimensional data")
+        elif isinstance(values, array) and values.typecode == "d":
+            self.data = values
+        else:
+            self.data = array("d", values)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Vector(self.data[i])
+        return self.data[i]
+
+    def __setitem__(self, i, value):
+        self.data[i] = value
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"Vector({self.tolist()})"
+
+    def tolist(self):
+        return self.data.tolist()
+
+
+class Matrix:
+    """a num_rows x num_cols matrix of floats stored row by row in one buffer
+    M[i] is the ith row (a view under NumPy, a copy otherwise), M[i, j] is an entry"""
+    __slots__ = ("data", "shape")
+
+    def __init__(self, rows=()):
+        if isinstance(rows, Matrix):
+            self.data, self.shape = rows.data, rows.shape
+            return
+        _load_numpy()
+        if np is not None:
+            data = np.asarray(rows, dtype=float)
+            if data.ndim == 1 and data.size == 0:    # Matrix([])
+                data = data.reshape(0, 0)
+            if data.ndim != 2:
+                raise ValueError("a Matrix needs a list of equal-length rows")
+            self.data, self.shape = data, data.shape
+            return
+        num_rows = len(rows)
+        num_cols = len(rows[0]) if num_rows else 0
+        data = array("d")
+        for row in rows:
+            if len(row) != num_cols:
+                raise ValueError("a Matrix needs a list of equal-length rows")
+            data.extend(row)
+        self.data, self.shape = data, (num_rows, num_cols)
+
+    @classmethod
+    def zeros(cls, num_rows, num_cols):
+        """a num_rows x num_cols matrix of 0.0s"""
+        _load_numpy()
+        if np is not None:
+            return cls(np.zeros((num_rows, num_cols)))
+        return cls._wrap(array("d", bytes(8 * num_rows * num_cols)), (num_rows, num_cols))
+
+    @classmethod
+    def _wrap(cls, data, shape):
+        """a Matrix around an existing flat array('d') buffer (no copy)"""
+        M = cls.__new__(cls)
+        M.data, M.shape = data, shape
+        return M
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.shape[0]))
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            i, j = index
+            if np is not None:
+                return self.data[i, j]
+            return self.data[self._offset(i, j)]
+        return self.row(index)
+
+    def __setitem__(self, index, value):
+        i, j = index
+        if np is not None:
+            self.data[i, j] = value
+        else:
+            self.data[self._offset(i, j)] = value
+
+    def _offset(self, i, j):
+        num_rows, num_cols = self.shape
+        if i < 0:
+            i += num_rows
+        if j < 0:
+            j += num_cols
+        if not (0 <= i < num_rows and 0 <= j < num_cols):
+            raise IndexError("matrix index out of range")
+        return i * num_cols + j
+
+    def row(self, i):
+        if np is not None:
+            return Vector(self.data[i])
+        num_rows, num_cols = self.shape
+        if i < 0:
+            i += num_rows
+        if not 0 <= i < num_rows:
+            raise IndexError("matrix row out of range")
+        return Vector(self.data[i * num_cols:(i + 1) * num_cols])
+
+    def column(self, j):
+        if np is not None:
+            return Vector(self.data[:, j])
+        num_cols = self.shape[1]
+        if j < 0:
+            j += num_cols
+        if not 0 <= j < num_cols:
+            raise IndexError("matrix column out of range")
+        return Vector(self.data[j::num_cols])       # a strided slice, done in C
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(Vector(a) == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"Matrix({self.tolist()})"
+
+    def tolist(self):
+        if np is not None:
+            return self.data.tolist()
+        return [self.row(i).tolist() for i in range(self.shape[0])]
+
+
+# The array versions of the list functions. Unlike zip, these refuse vectors of different
+# lengths, since (as above) we're not allowed to add them anyway.
+
+def _as_buffer(v):
+    """the storage behind a Vector, or v as something the backend can do arithmetic on"""
+    if isinstance(v, Vector):
+        return v.data
+    if np is not None:
+        return np.asarray(v, dtype=float)
+    return v
+
+def _check_lengths(v, w):
+    if len(v) != len(w):
+        raise ValueError(f"vectors have different lengths ({len(v)} and {len(w)})")
+
+def _array_add(v, w):
+    _check_lengths(v, w)
+    if np is not None:
+        return Vector(_as_buffer(v) + _as_buffer(w))
+    return Vector(array("d", map(operator.add, v, w)))
+
+def _array_subtract(v, w):
+    _check_lengths(v, w)
+    if np is not None:
+        return Vector(_as_buffer(v) - _as_buffer(w))
+    return Vector(array("d", map(operator.sub, v, w)))
+
+def _array_scale(c, v):
+    if np is not None:
+        return Vector(c * v.data)
+    return Vector(array("d", map(operator.mul, repeat(c, len(v)), v)))
+
+def _array_dot(v, w):
+    _check_lengths(v, w)
+    if np is not None:
+        return float(np.dot(_as_buffer(v), _as_buffer(w)))
+    return sum(map(operator.mul, v, w))
+
+
+# Sparse matrices
+# The dense friendships matrix above takes n * n entries to record what the edge list says in
+# a couple of numbers per edge, and finding someone's friends means scanning a whole row.
+# For a graph with millions of users that's hopeless. Almost every entry is 0, so instead we
+# store only the nonzero ones, row by row (the "compressed sparse row" layout): the column
+# indices of row i's entries are indices[indptr[i]:indptr[i + 1]], in increasing order, and
+# their values are the same slice of data. For a plain 0/1 adjacency matrix there's no need
+# to store all those 1s, so data is None.
+
+from bisect import bisect_left
+
+class CSRMatrix:
+    """a num_rows x num_cols matrix that stores only its nonzero entries, row by row"""
+    __slots__ = ("indptr", "indices", "data", "shape", "_row_ids")
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = indptr                        # len num_rows + 1, starts at 0
+        self.indices = indices                      # column of each entry, sorted per row
+        self.data = data                            # value of each entry, or None for all 1s
+        self.shape = shape
+        self._row_ids = None                        # row of each entry, built when needed
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, directed=False):
+        """the adjacency matrix of a graph given as (i, j) pairs; each undirected edge is
+        stored in both directions, and repeated edges are stored once"""
+        sources, targets = array("q"), array("q")
+        for i, j in edges:
+            sources.append(i)
+            targets.append(j)
+        if not directed:
+            sources, targets = sources + targets, targets + sources
+        if num_nodes is None:
+            num_nodes = max(max(sources, default=-1), max(targets, default=-1)) + 1
+        lowest = min(min(sources, default=0), min(targets, default=0))
+        highest = max(max(sources, default=0), max(targets, default=0))
+        if lowest < 0 or sources and highest >= num_nodes:
+            bad = lowest if lowest < 0 else highest
+            raise ValueError(f"node ids must be in range({num_nodes}), got {bad}")
+        return cls._from_coordinates(sources, targets, None, (num_nodes, num_nodes))
+
+    @classmethod
+    def from_dense(cls, A):
+        """the sparse version of a list-of-lists (or Matrix) A"""
+        num_rows, num_cols = shape(A)
+        rows, cols, values = array("q"), array("q"), []
+        for i, row in enumerate(A):
+            for j, A_ij in enumerate(row):
+                if A_ij:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(A_ij)
+        if all(value == 1 for value in values):
+            values = None
+        return cls._from_coordinates(rows, cols, values, (num_rows, num_cols))
+
+    @classmethod
+    def _from_coordinates(cls, rows, cols, values, shape):
+        """builds the matrix from parallel sequences of entries; with values None every
+        entry is a 1 and duplicates are dropped (duplicates with values aren't allowed)"""
+        _load_numpy()
+        num_rows, num_cols = shape
+        if np is not None:
+            keys = np.asarray(rows, dtype=np.int64) * num_cols + np.asarray(cols, dtype=np.int64)
+            if values is None:
+                keys = np.unique(keys)              # sorted, without repeats
+                data = None
+            else:
+                order = np.argsort(keys, kind="stable")
+                keys, data = keys[order], np.asarray(values, dtype=float)[order]
+            width = max(num_cols, 1)                # (no entries at all if num_cols is 0)
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(keys // width, minlength=num_rows))))
+            return cls(indptr, keys % width, data, shape)
+
+        keys = [i * num_cols + j for i, j in zip(rows, cols)]
+        if values is None:
+            keys = sorted(set(keys))
+            data = None
+        else:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys = [keys[k] for k in order]
+            data = array("d", (values[k] for k in order))
+        indptr = array("q", bytes(8 * (num_rows + 1)))
+        for key in keys:
+            indptr[key // num_cols + 1] += 1
+        for i in range(num_rows):
+            indptr[i + 1] += indptr[i]
+        return cls(indptr, array("q", (key % num_cols for key in keys)), data, shape)
+
+    def neighbors(self, i):
+        """the columns j with A[i][j] != 0, in O(degree) time"""
+        i = _check_index(i, self.shape[0])
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def degrees(self):
+        """the number of nonzero entries in each row, as an integer array"""
+        if np is not None:
+            return np.diff(self.indptr)
+        return array("q", (self.indptr[i + 1] - self.indptr[i] for i in range(self.shape[0])))
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            return self.row(index)
+        i, j = _check_index(index[0], self.shape[0]), _check_index(index[1], self.shape[1])
+        start, end = self.indptr[i], self.indptr[i + 1]
+        k = bisect_left(self.indices, j, start, end)
+        if k < end and self.indices[k] == j:
+            return 1 if self.data is None else self.data[k]
+        return 0
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.shape[0]))
+
+    def row(self, i):
+        """row i as a dense list"""
+        i = _check_index(i, self.shape[0])
+        row = [0] * self.shape[1]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        for k in range(start, end):
+            row[self.indices[k]] = 1 if self.data is None else self.data[k]
+        return row
+
+    def column(self, j):
+        """column j as a dense list (a binary search in every row)"""
+        return [self[i, j] for i in range(self.shape[0])]
+
+    def to_dense(self):
+        """the list-of-lists version of the matrix"""
+        return [self.row(i) for i in range(self.shape[0])]
+
+    def transpose(self):
+        """the transposed matrix (equivalently, this matrix in column-major form)"""
+        num_rows, num_cols = self.shape
+        rows = self.row_ids()
+        if np is None:
+            rows = array("q", rows)
+        return CSRMatrix._from_coordinates(self.indices, rows, self.data, (num_cols, num_rows))
+
+    def row_ids(self):
+        """the row of each stored entry (the counterpart of indices)"""
+        if self._row_ids is None:
+            if np is not None:
+                self._row_ids = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+            else:
+                self._row_ids = array("q", (i for i in range(self.shape[0])
+                                            for _ in range(self.indptr[i + 1] - self.indptr[i])))
+        return self._row_ids
+
+    def matrix_vector_multiply(self, v):
+        """the vector whose ith element is the sum of A[i][j] * v[j] over row i's entries"""
+        num_rows, num_cols = self.shape
+        if len(v) != num_cols:
+            raise ValueError(f"can't multiply a {num_rows}x{num_cols} matrix by a vector of length {len(v)}")
+        if np is not None:
+            weights = _as_buffer(v)[self.indices]
+            if self.data is not None:
+                weights = weights * self.data
+            result = np.bincount(self.row_ids(), weights=weights, minlength=num_rows)
+            return Vector(result) if isinstance(v, Vector) else result.tolist()
+        indptr, indices, data = self.indptr, self.indices, self.data
+        if data is None:
+            result = [sum(v[indices[k]] for k in range(indptr[i], indptr[i + 1]))
+                      for i in range(num_rows)]
+        else:
+            result = [sum(data[k] * v[indices[k]] for k in range(indptr[i], indptr[i + 1]))
+                      for i in range(num_rows)]
+        return Vector(result) if isinstance(v, Vector) else result
+
+    def __repr__(self):
+        return f"CSRMatrix(shape={self.shape}, nonzeros={len(self.indices)})"
+
+
+if __name__ == "__main__":
+    friendship_graph = CSRMatrix.from_dense(friendships)   # or CSRMatrix.from_edges(pairs)
+    list(friendship_graph.neighbors(5))                     # [4, 6, 7], without scanning a row
+
+
+# Solving linear systems
+# To solve A x = b (say the normal equations X^T X beta = X^T y of a least-squares fit) we
+# factor A once into triangular pieces, which takes O(n^3), after which each right-hand side
+# takes only O(n^2): a forward and a back substitution.
+#   LU: P A = L U with L unit lower triangular and U upper triangular, choosing the largest
+#       remaining entry of each column as the pivot (partial pivoting) to keep it stable.
+#   Cholesky: A = L L^T, for symmetric positive definite A (like X^T X): half the work.
+# Since the same matrix tends to be solved against again and again, factorizations are kept
+# in a cache keyed on the matrix's contents, so a changed matrix is simply a different key.
+
+import hashlib
+from itertools import chain
+
+
+class LUDecomposition:
+    """P A = L U, with L and U packed into one matrix (L's diagonal of ones left implicit)"""
+
+    def __init__(self, A):
+        num_rows, num_cols = shape(A)
+        _check_square(num_rows, num_cols)
+        self.n = num_rows
+        self.sign = 1                               # of the permutation, for the determinant
+        self.singular = False
+        if isinstance(A, Matrix) and np is not None:
+            self._factor_array(np.array(A.data, dtype=float))
+        else:
+            self._factor_rows([list(map(float, row)) for row in _rows_of(A)])
+
+    def _factor_rows(self, lu):
+        n = self.n
+        perm = list(range(n))
+        for k in range(n):
+            p = max(range(k, n), key=lambda i: abs(lu[i][k]))
+            if lu[p][k] == 0:
+                self.singular = True                # nothing to eliminate with in this column
+                continue
+            if p != k:
+                lu[k], lu[p] = lu[p], lu[k]
+                perm[k], perm[p] = perm[p], perm[k]
+                self.sign = -self.sign
+            pivot_row = lu[k]
+            tail = pivot_row[k + 1:]
+            for row in lu[k + 1:]:
+                factor = row[k] / pivot_row[k]
+                row[k] = factor
+                if factor:
+                    row[k + 1:] = [x - factor * y for x, y in zip(row[k + 1:], tail)]
+        self.lu, self.perm = lu, perm
+
+    def _factor_array(self, lu):
+        n = self.n
+        perm = np.arange(n)
+        for k in range(n):
+            p = k + int(np.abs(lu[k:, k]).argmax())
+            if lu[p, k] == 0:
+                self.singular = True
+                continue
+            if p != k:
+                lu[[k, p]] = lu[[p, k]]
+                perm[[k, p]] = perm[[p, k]]
+                self.sign = -self.sign
+            lu[k + 1:, k] /= lu[k, k]
+            lu[k + 1:, k + 1:] -= np.outer(lu[k + 1:, k], lu[k, k + 1:])
+        self.lu, self.perm = lu, perm
+
+    def solve_columns(self, columns):
+        """the solutions x of A x = b for each b in columns (plain lists, or for an
+        array-backed factorization one NumPy array with a column per b)"""
+        if self.singular:
+            raise ValueError("matrix is singular")
+        lu, n = self.lu, self.n
+        if isinstance(lu, list):
+            solutions = []
+            for b in columns:
+                y = [b[i] for i in self.perm]
+                for i in range(n):                  # L y = P b, top down
+                    y[i] -= sum(map(operator.mul, lu[i][:i], y[:i]))
+                for i in reversed(range(n)):        # U x = y, bottom up
+                    y[i] = (y[i] - sum(map(operator.mul, lu[i][i + 1:], y[i + 1:]))) / lu[i][i]
+                solutions.append(y)
+            return solutions
+        y = np.array(columns, dtype=float)[self.perm]
+        for i in range(n):
+            y[i] -= lu[i, :i] @ y[:i]
+        for i in reversed(range(n)):
+            y[i] = (y[i] - lu[i, i + 1:] @ y[i + 1:]) / lu[i, i]
+        return y
+
+    def determinant(self):
+        if self.singular:
+            return 0.0
+        return self.sign * float(math.prod(self.lu[i][i] for i in range(self.n)))
+
+
+class CholeskyDecomposition:
+    """A = L L^T for a symmetric positive definite A, with L lower triangular"""
+
+    def __init__(self, A, tolerance=1e-12):
+        num_rows, num_cols = shape(A)
+        _check_square(num_rows, num_cols)
+        self.n = n = num_rows
+        if isinstance(A, Matrix) and np is not None:
+            rows = A.data
+            scale = float(np.abs(rows).max()) if n else 0.0
+            if not np.allclose(rows, rows.T, rtol=0, atol=tolerance * scale):
+                raise ValueError("matrix isn't symmetric")
+        else:
+            rows = _rows_of(A)
+            scale = max((abs(x) for row in rows for x in row), default=0.0)
+            if any(abs(rows[i][j] - rows[j][i]) > tolerance * scale
+                   for i in range(n) for j in range(i)):
+                raise ValueError("matrix isn't symmetric")
+        L = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            L_i = L[i]
+            for j in range(i + 1):
+                L_j = L[j]
+                s = float(rows[i][j]) - sum(map(operator.mul, L_i[:j], L_j[:j]))
+                if i == j:
+                    if s <= 0:
+                        raise ValueError("matrix isn't positive definite")
+                    L_i[i] = math.sqrt(s)
+                else:
+                    L_i[j] = s / L_j[j]
+        self.L = L
+
+    def solve_columns(self, columns):
+        """the solutions x of A x = b for each b in columns"""
+        L, n = self.L, self.n
+        solutions = []
+        for b in columns:
+            y = list(map(float, b))
+            for i in range(n):                      # L y = b
+                y[i] = (y[i] - sum(map(operator.mul, L[i][:i], y[:i]))) / L[i][i]
+            for i in reversed(range(n)):            # L^T x = y, L^T's row i is L's column i
+                y[i] = (y[i] - sum(L[k][i] * y[k] for k in range(i + 1, n))) / L[i][i]
+            solutions.append(y)
+        return solutions
+
+    def determinant(self):
+        return math.prod(self.L[i][i] for i in range(self.n)) ** 2
+
+
+def _check_square(num_rows, num_cols):
+    if num_rows != num_cols:
+        raise ValueError(f"can't factor a {num_rows}x{num_cols} matrix: it isn't square")
+
+
+_DECOMPOSITIONS = {"lu": LUDecomposition, "cholesky": CholeskyDecomposition}
+
+class FactorizationCache:
+    """the factorizations of the last maxsize matrices factored, by method and contents"""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._factorizations = OrderedDict()
+
+    @staticmethod
+    def key(A, method):
+        """(method, whether A is array-backed, shape, a hash of the entries): O(n^2) to
+        compute, so cheap next to a factorization, and different as soon as any entry changes"""
+        if isinstance(A, Matrix):
+            entries = A.data.tobytes()
+        else:
+            entries = array("d", chain.from_iterable(_rows_of(A))).tobytes()
+        digest = hashlib.blake2b(entries, digest_size=16).digest()
+        return method, isinstance(A, Matrix), shape(A), digest
+
+    def get(self, A, method="lu"):
+        key = self.key(A, method)
+        factorization = self._factorizations.get(key)
+        if factorization is not None:
+            self.hits += 1
+            self._factorizations.move_to_end(key)
+            return factorization
+        self.misses += 1
+        factorization = _DECOMPOSITIONS[method](A)
+        self._factorizations[key] = factorization
+        if len(self._factorizations) > self.maxsize:
+            self._factorizations.popitem(last=False)
+        return factorization
+
+    def clear(self):
+        self._factorizations.clear()
+
+factorizations = FactorizationCache()
+
+
+def factor(A, method="lu", cache=factorizations):
+    """the LU ("lu") or Cholesky ("cholesky") decomposition of the square matrix A, from the
+    cache if A (with the same entries) was factored before; cache=None always factors"""
+    if method not in _DECOMPOSITIONS:
+        raise ValueError(f"method must be one of {', '.join(_DECOMPOSITIONS)}")
+    return cache.get(A, method) if cache is not None else _DECOMPOSITIONS[method](A)
+
+def solve(A, b, method="lu", cache=factorizations):
+    """x with A x = b, for a vector b, or X with A X = B for a matrix B (one column per
+    right-hand side); method="cholesky" for symmetric positive definite A"""
+    factorization = factor(A, method, cache)
+    n = factorization.n
+    matrix_rhs = isinstance(b, Matrix) or (not isinstance(b, Vector) and len(b)
+                                            and isinstance(b[0], (list, tuple, Vector)))
+    if matrix_rhs:
+        num_rows, num_cols = shape(b)
+        if num_rows != n:
+            raise ValueError(f"can't solve a {n}x{n} system for a {num_rows}x{num_cols} matrix")
+        columns = _rows_of(transpose(b))
+    else:
+        if len(b) != n:
+            raise ValueError(f"can't solve a {n}x{n} system for a vector of length {len(b)}")
+        columns = [list(b)]
+    array_backed = isinstance(A, Matrix) or isinstance(b, (Matrix, Vector))
+    if isinstance(factorization, LUDecomposition) and not isinstance(factorization.lu, list):
+        solutions = factorization.solve_columns(np.array(columns, dtype=float).T).T
+    else:
+        solutions = factorization.solve_columns(columns)
+    if matrix_rhs:
+        X = transpose(solutions) if isinstance(solutions, list) else solutions.T
+        return Matrix(X) if array_backed else [list(row) for row in X]
+    x = solutions[0]
+    return Vector(x) if array_backed else list(x)
+
+def inverse(A, method="lu", cache=factorizations):
+    """the matrix A^-1 with A A^-1 = I (solve is cheaper, if you only need A^-1 b)"""
+    n = shape(A)[0]
+    identity = make_matrix(n, n, is_diagonal)
+    return solve(A, Matrix(identity) if isinstance(A, Matrix) else identity, method, cache)
+
+def determinant(A, method="lu", cache=factorizations):
+    return factor(A, method, cache).determinant()
+
+
+if __name__ == "__main__":
+    A = [[4, 2, 0],
+         [2, 5, 3],
+         [0, 3, 6]]
+    solve(A, [2, 1, 3])                                     # [0.8, -0.6, 0.8]
+    solve(A, [1, 0, 0])                                     # A's LU comes from the cache
+    solve(A, [2, 1, 3], method="cholesky")                  # A is symmetric positive definite
+    determinant(A)                                          # 60.0
@@ -4,9 +4,10 @@
 
 # But now you are faced with the problem of how to describe it.
 # One obvious description of any data set is simply the data itself:
-num_friends = [100, 49, 41, 40, 25,
-                # ... and lots more
-                ]
+if __name__ == "__main__":
+    num_friends = [100, 49, 41, 40, 25,
+                    # ... and lots more
+                    ]
 
 # For a small enough data set this might even be the best description. But for a larger data
 # set, this is unwieldy and probably opaque. (Imagine staring at a list of 1 million numbers.)
@@ -14,42 +15,345 @@ num_friends = [100, 49, 41, 40, 25,
 # As a first approach you put the friend counts into a histogram using Counter and 
 # plt.bar() (Figure 5-1):
 
-from matplotlib import pyplot as plt
-from collections import Counter
+from collections import Counter, OrderedDict
+from array import array
+from itertools import islice
+import hashlib
+import heapq
+import math
+import random
+import struct
+import sys
 
-friend_counts = Counter(num_friends)
-xs = range(101) # largest value is 100
-ys = [friend_counts[x] for x in xs] # height is just # of friends
-# plt.bar(xs, ys)
-# plt.axis([0, 101, 0, 25])
-# plt.title("Histogram of Friend Counts")
-# plt.xlabel("# of friends")
-# plt.ylabel("# of people")
-# plt.show()
+from ._arrays import is_ndarray, load_numpy
+
+if __name__ == "__main__":
+    friend_counts = Counter(num_friends)
+    xs = range(101) # largest value is 100
+    ys = [friend_counts[x] for x in xs] # height is just # of friends
+    # from matplotlib import pyplot as plt     # (only when we actually draw: it's slow to import)
+    # plt.bar(xs, ys)
+    # plt.axis([0, 101, 0, 25])
+    # plt.title("Histogram of Friend Counts")
+    # plt.xlabel("# of friends")
+    # plt.ylabel("# of people")
+    # plt.show()
 
 
 # Unfortunately, this chart is still too difficult to slip into conversations. So you start
 # generating some statistics. Probably the simplest statistic is simply the number of data points:
-num_points = len(num_friends) # 204
+if __name__ == "__main__":
+    num_points = len(num_friends) # 204
 
 # You’re probably also interested in the largest and smallest values:
-largest_value = max(num_friends) # 100
-smallest_value = min(num_friends) # 1
+if __name__ == "__main__":
+    largest_value = max(num_friends) # 100
+    smallest_value = min(num_friends) # 1
 
 # which are just special cases of wanting to know the values in specific positions:
-sorted_values = sorted(num_friends)
-smallest_value = sorted_values[0]                   # 1
-second_smallest_value = sorted_values[1]            # 1
-second_largest_value = sorted_values[-2]            # 49
+if __name__ == "__main__":
+    sorted_values = sorted(num_friends)
+    smallest_value = sorted_values[0]                   # 1
+    second_smallest_value = sorted_values[1]            # 1
+    second_largest_value = sorted_values[-2]            # 49
+
+# Statistics of data you can only see once
+# Everything below takes a list, and most of it needs len(x) or makes more than one pass
+# (data_range calls max and then min). That rules out a generator, or a file too big to
+# load. All of the simple summary statistics can be kept up to date one value at a time,
+# though, including the variance (Welford's method keeps the sum of squared deviations from
+# the running mean), and two summaries of different parts of the data can be combined
+# exactly (Chan et al.'s formula), so chunks can be summarized separately, even by
+# different workers, and merged.
+
+class RunningStats:
+    """count, sum, mean, variance, standard deviation, min, max and range of the values
+    seen so far, in O(1) memory"""
+
+    chunk_size = 65536                          # values per batch when reading an iterator
+
+    def __init__(self, track_variance=True, track_extremes=True):
+        self.track_variance = track_variance    # (the mean alone doesn't need these)
+        self.track_extremes = track_extremes
+        self.count = 0
+        self.total = 0
+        self.sum_squared_deviations = 0.0       # sum of (x - mean)**2, "M2" in Welford
+        self.min = None
+        self.max = None
+
+    def update(self, value):
+        """adds one value"""
+        old_mean = self.total / self.count if self.count else 0.0
+        if self.track_extremes:
+            if self.count:
+                self.min = min(self.min, value)
+                self.max = max(self.max, value)
+            else:
+                self.min = self.max = value
+        self.count += 1
+        self.total += value
+        if self.track_variance:
+            self.sum_squared_deviations += (value - old_mean) * (value - self.total / self.count)
+        return self
+
+    def update_many(self, chunk):
+        """adds a list, array or iterable of values, a chunk at a time"""
+        if is_ndarray(chunk):
+            return self._merge_summary(*self._summarize_array(chunk))
+        if not hasattr(chunk, "__len__"):
+            iterator = iter(chunk)
+            while batch := list(islice(iterator, self.chunk_size)):
+                self._merge_summary(*self._summarize(batch))
+            return self
+        if len(chunk):
+            self._merge_summary(*self._summarize(chunk))
+        return self
+
+    def _summarize(self, chunk):
+        """count, sum, M2, min and max of a non-empty sequence"""
+        n, total = len(chunk), sum(chunk)
+        m2 = 0.0
+        if self.track_variance:
+            chunk_mean = total / n
+            m2 = math.fsum((x - chunk_mean) ** 2 for x in chunk)
+        if not self.track_extremes:
+            return n, total, m2, None, None
+        return n, total, m2, min(chunk), max(chunk)
+
+    def _summarize_array(self, chunk):
+        n = chunk.size
+        if not n:
+            return 0, 0, 0.0, None, None
+        total = chunk.sum().item()
+        m2 = 0.0
+        if self.track_variance:
+            m2 = float(((chunk - total / n) ** 2).sum())
+        if not self.track_extremes:
+            return n, total, m2, None, None
+        return n, total, m2, chunk.min().item(), chunk.max().item()
+
+    def _merge_summary(self, n, total, m2, lo, hi):
+        if not n:
+            return self
+        if self.count:
+            delta = total / n - self.total / self.count
+            m2 += self.sum_squared_deviations + delta * delta * self.count * n / (self.count + n)
+            if self.track_extremes:
+                lo, hi = min(self.min, lo), max(self.max, hi)
+        self.count += n
+        self.total += total
+        self.sum_squared_deviations = m2 if self.track_variance else 0.0
+        if self.track_extremes:
+            self.min, self.max = lo, hi
+        return self
+
+    def merge(self, other):
+        """folds in the summary of other values (another chunk, another worker's share)"""
+        if self.track_variance and other.count and not other.track_variance:
+            raise ValueError("can't merge a summary that doesn't track the variance")
+        if self.track_extremes and other.count and not other.track_extremes:
+            raise ValueError("can't merge a summary that doesn't track min and max")
+        return self._merge_summary(other.count, other.total, other.sum_squared_deviations,
+                                   other.min, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    @property
+    def range(self):
+        if not self.track_extremes:
+            raise ValueError("this summary doesn't track min and max")
+        if not self.count:
+            raise ValueError("range of no values")
+        return self.max - self.min
+
+    @property
+    def variance(self):
+        """the sample variance (dividing by n - 1)"""
+        if not self.track_variance:
+            raise ValueError("this summary doesn't track the variance")
+        if self.count < 2:
+            raise ValueError("variance requires at least two values")
+        return self.sum_squared_deviations / (self.count - 1)
+
+    @property
+    def standard_deviation(self):
+        return math.sqrt(self.variance)
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, total={self.total}, min={self.min}, max={self.max})"
+
 
 # Central Tendencies
 # Usually, we’ll want some notion of where our data is centered. Most commonly we’ll use
 # the mean (or average), which is just the sum of the data divided by its count:
 # this isn't right if you don't from __future__ import division
 def mean(x):
-    return sum(x) / len(x)
-mean(num_friends)                                   # 7.333333
+    return RunningStats(track_variance=False, track_extremes=False).update_many(x).mean
+if __name__ == "__main__":
+    mean(num_friends)                                   # 7.333333
+
+
+
+# Medians and quantiles (below) need the data in memory. For a stream of billions of values
+# we can settle for an approximate answer instead, from a sketch: a small summary that can say
+# roughly what fraction of the values are below any given value. A KLL sketch keeps a
+# stack of buffers ("compactors"). New values go into the bottom one; when a buffer fills
+# up it's sorted and every other value (starting at a random one of the first two) moves
+# up a level, where it stands in for two values. The buffers higher up are bigger, so the
+# total space stays around k / (1 - c) values however long the stream runs, and the rank
+# of any value is off by at most about 1.3% of the count for k = 200 (with high
+# probability, and shrinking roughly like 1 / k). Sketches of different shards can be
+# merged, and they pack into bytes to move them around. median, quantile and quantiles all
+# accept a sketch in place of the data.
+
+class KLLSketch:
+    """an approximate quantile summary of a stream, in fixed memory; either give k (the
+    size of the biggest buffer) or the rank error you're willing to accept"""
+
+    def __init__(self, k=200, error=None, c=2 / 3, seed=None):
+        if error is not None:
+            k = max(8, math.ceil((2.296 / error) ** (1 / 0.9723)))   # empirical KLL bound
+        self.k = k
+        self.c = c
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.compactors = [[]]                  # compactors[h] holds values of weight 2**h
+        self._random = random.Random(seed)
+        self._update_max_size()
+
+    def _capacity(self, h):
+        depth = len(self.compactors) - h - 1    # the top level has the biggest capacity
+        return math.ceil(self.k * self.c ** depth) + 1
+
+    def _update_max_size(self):
+        self.size = sum(len(items) for items in self.compactors)
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value):
+        """adds one value"""
+        self.update_many((value,))
+
+    def update_many(self, values):
+        """adds every value in an iterable"""
+        values = iter(values)
+        while batch := list(islice(values, max(self.max_size - self.size, 1))):
+            self.compactors[0].extend(batch)
+            self.size += len(batch)
+            self.count += len(batch)
+            lo, hi = min(batch), max(batch)
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+            self._compress()
+        return self
+
+    def _compress(self):
+        while self.size >= self.max_size:
+            for h, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    self._compact(h)
+                    break
+            self._update_max_size()
+
+    def _compact(self, h):
+        """sorts level h and promotes every other value to level h + 1"""
+        items = sorted(self.compactors[h])
+        odd = len(items) % 2                    # an odd value out stays behind
+        start = odd + self._random.randint(0, 1)
+        self.compactors[h + 1].extend(items[start::2])
+        self.compactors[h] = items[:odd]
+
+    def merge(self, other):
+        """folds in the sketch of another part of the stream"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for items, other_items in zip(self.compactors, other.compactors):
+            items.extend(other_items)
+        self.count += other.count
+        for extreme in (other.min, other.max):
+            if extreme is not None:
+                self.min = extreme if self.min is None else min(self.min, extreme)
+                self.max = extreme if self.max is None else max(self.max, extreme)
+        self._update_max_size()
+        self._compress()
+        return self
+
+    def _weighted_values(self):
+        """the retained values in increasing order, each with the number it stands for"""
+        return sorted((value, 2 ** h) for h, items in enumerate(self.compactors) for value in items)
 
+    def quantiles(self, ps):
+        """approximately [quantile(stream, p) for p in ps]"""
+        if not self.count:
+            raise IndexError("list index out of range")
+        weighted = self._weighted_values()
+        results = []
+        for p in ps:
+            p_index = int(p * self.count)
+            if p_index < 0:
+                p_index += self.count
+            if not 0 <= p_index < self.count:
+                raise IndexError("list index out of range")
+            if p_index == 0:
+                results.append(self.min)
+                continue
+            if p_index == self.count - 1:
+                results.append(self.max)
+                continue
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen > p_index:
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, p):
+        return self.quantiles([p])[0]
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def __len__(self):
+        return self.size                        # values retained, not values seen
+
+    _header = struct.Struct("<4sIdQI")          # magic, k, c, count, number of levels
+
+    def to_bytes(self):
+        """the sketch packed for sending to another process or machine (values become floats)"""
+        parts = [self._header.pack(b"KLL1", self.k, self.c, self.count, len(self.compactors))]
+        if self.count:
+            parts.append(struct.pack("<dd", self.min, self.max))
+        for items in self.compactors:
+            parts.append(struct.pack("<I", len(items)))
+            parts.append(array("d", items).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, seed=None):
+        magic, k, c, count, num_levels = cls._header.unpack_from(data)
+        if magic != b"KLL1":
+            raise ValueError("not a serialized KLLSketch")
+        sketch = cls(k=k, c=c, seed=seed)
+        sketch.count = count
+        offset = cls._header.size
+        if count:
+            sketch.min, sketch.max = struct.unpack_from("<dd", data, offset)
+            offset += 16
+        sketch.compactors = []
+        for _ in range(num_levels):
+            (length,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            items = array("d")
+            items.frombytes(data[offset:offset + 8 * length])
+            sketch.compactors.append(items.tolist())
+            offset += 8 * length
+        sketch._update_max_size()
+        return sketch
 
 
 # Median
@@ -59,46 +363,343 @@ mean(num_friends)                                   # 7.333333
 # For example, if you make the largest point larger (or the smallest point smaller), the
 # middle points remain unchanged, which means so does the median.
 
-def median(v):
+# Sorting all of v just to look at one or two positions is more work than we need, though.
+# Quickselect finds the value that *would* be at position k of sorted(v) by splitting v
+# around a pivot and only looking further into the side that contains position k, which
+# takes O(n) time on average. (If the pivots keep coming out lopsided we give up and sort
+# that part, so the worst case is still O(n log n).) The same splitting finds several
+# positions at once, sending each one down the side it's on.
+
+def _select_many(x, ks):
+    """{k: sorted(x)[k] for k in ks}, by quickselect"""
+    found = {}
+    depth_limit = 2 * max(len(x), 1).bit_length()
+    stack = [(x, 0, sorted(set(ks)), 0)]        # (part of x, rank of its first value, ks in it, depth)
+    while stack:
+        part, offset, wanted, depth = stack.pop()
+        if len(part) <= 32 or depth > depth_limit:
+            sorted_part = sorted(part)
+            for k in wanted:
+                found[k] = sorted_part[k - offset]
+            continue
+        pivot = sorted([part[0], part[len(part) // 2], part[-1]])[1]    # median of three
+        lows = [x_i for x_i in part if x_i < pivot]
+        highs = [x_i for x_i in part if x_i > pivot]
+        highs_offset = offset + len(part) - len(highs)
+        lows_end = offset + len(lows)
+        for k in wanted:
+            if lows_end <= k < highs_offset:
+                found[k] = pivot
+        low_ks = [k for k in wanted if k < lows_end]
+        high_ks = [k for k in wanted if k >= highs_offset]
+        if low_ks:
+            stack.append((lows, offset, low_ks, depth + 1))
+        if high_ks:
+            stack.append((highs, highs_offset, high_ks, depth + 1))
+    return found
+
+
+# If you ask about the same data over and over, it's cheaper still to sort it once and keep
+# the sorted copy around. Python lists can't tell us when they've changed, so the cache is
+# keyed on the data's identity *and* a version, which can be anything you like (a counter, a
+# timestamp) as long as you change it whenever you change the data.
+
+class SortedViewCache:
+    """sorted copies of the last maxsize datasets queried, keyed on (identity, version);
+    entries keep their data alive, so a reused id can't be mistaken for the old data"""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._views = OrderedDict()             # id(x) -> (x, version, sorted copy of x)
+
+    def get(self, x, version):
+        """sorted(x), reused if x (the same object, at the same version) was seen before"""
+        entry = self._views.get(id(x))
+        if entry is not None and entry[0] is x and entry[1] == version and len(entry[2]) == len(x):
+            self._views.move_to_end(id(x))
+            return entry[2]
+        view = load_numpy().sort(x) if is_ndarray(x) else sorted(x)
+        self._views[id(x)] = (x, version, view)
+        self._views.move_to_end(id(x))
+        if len(self._views) > self.maxsize:
+            self._views.popitem(last=False)
+        return view
+
+    def clear(self):
+        self._views.clear()
+
+sorted_views = SortedViewCache()
+
+
+def _order_statistics(x, ks, version=None):
+    """[sorted(x)[k] for k in ks], without sorting x unless it's cheaper
+    (or unless a version is given, in which case the sorted copy is cached)"""
+    n = len(x)
+    ks = [k + n if k < 0 else k for k in ks]    # negative positions count from the end
+    if any(not 0 <= k < n for k in ks):
+        raise IndexError("list index out of range")
+    if version is not None:
+        sorted_x = sorted_views.get(x, version)
+        values = [sorted_x[k] for k in ks]
+    elif is_ndarray(x):
+        partitioned = load_numpy().partition(x, ks)
+        values = [partitioned[k] for k in ks]
+    elif len(set(ks)) > n.bit_length():         # so many positions we might as well sort
+        sorted_x = sorted(x)
+        values = [sorted_x[k] for k in ks]
+    else:
+        found = _select_many(x, ks)
+        return [found[k] for k in ks]
+    if is_ndarray(x):
+        return [value.item() for value in values]
+    return values
+
+
+def median(v, version=None):
     """finds the 'middle-most' value of v"""
+    if isinstance(v, KLLSketch):
+        return v.median()
     n = len(v)
-    sorted_v = sorted(v)
     midpoint = n // 2
     if n % 2 == 1:
     # if odd, return the middle value
-        return sorted_v[midpoint]
+        return _order_statistics(v, [midpoint], version)[0]
     else:
     # if even, return the average of the middle values
         lo = midpoint - 1
         hi = midpoint
-        return (sorted_v[lo] + sorted_v[hi]) / 2
+        lo_value, hi_value = _order_statistics(v, [lo, hi], version)
+        return (lo_value + hi_value) / 2
 
-median(num_friends)                                     # 6.0
+if __name__ == "__main__":
+    median(num_friends)                                     # 6.0
 
 
 # A generalization of the median is the quantile, which represents the value less than which
 # a certain percentile of the data lies. (The median represents the value less than which 50%
 # of the data lies.)
 
-def quantile(x, p):
+def quantile(x, p, version=None):
     """returns the pth-percentile value in x"""
+    if isinstance(x, KLLSketch):
+        return x.quantile(p)
     p_index = int(p * len(x))
-    return sorted(x)[p_index]
-quantile(num_friends, 0.10) # 1
-quantile(num_friends, 0.25) # 3
-quantile(num_friends, 0.75) # 9
-quantile(num_friends, 0.90) # 13
+    return _order_statistics(x, [p_index], version)[0]
+
+# and since reports tend to want several percentiles of the same data:
+def quantiles(x, ps, version=None):
+    """returns [quantile(x, p) for p in ps], looking through x only once"""
+    if isinstance(x, KLLSketch):
+        return x.quantiles(ps)
+    return _order_statistics(x, [int(p * len(x)) for p in ps], version)
+if __name__ == "__main__":
+    quantile(num_friends, 0.10) # 1
+    quantile(num_friends, 0.25) # 3
+    quantile(num_friends, 0.75) # 9
+    quantile(num_friends, 0.90) # 13
+
+
+# Counting
+# The histogram at the top of the chapter (and the mode, below) start from Counter(x), which
+# keeps one dict entry per distinct value, and then look every bucket up in the dict again.
+# When the values are small non-negative integers (like friend counts) a list indexed by
+# the value does the same job: counts[v] is how many times v appears.
+
+_BUFFER_TYPES = (array, memoryview)
+
+def bincount(x, minlength=0):
+    """counts[v] = the number of times v appears in x, for non-negative integers v"""
+    np = load_numpy() if is_ndarray(x) or isinstance(x, _BUFFER_TYPES) else None
+    if np is not None:
+        return np.bincount(np.asarray(x), minlength=minlength).tolist()
+    counts = Counter(x)                         # counting itself happens in C
+    if any(not isinstance(v, int) or v < 0 for v in counts):
+        raise ValueError("bincount needs non-negative integers")
+    dense = [0] * max(minlength, max(counts, default=-1) + 1)
+    for v, count in counts.items():
+        dense[v] = count
+    return dense
+
+# so that the friend-count histogram is just ys = bincount(num_friends, minlength=101)
+
+
+# When there are too many distinct values to keep a count for each one (user ids in a
+# stream of events, say), we can still find the frequent ones. The Misra-Gries summary keeps
+# at most k counters. A value that already has a counter gets its counter bumped; a new one
+# gets a counter if there's room, and otherwise *every* counter goes down by one (and the
+# ones that hit zero are dropped). Any value that makes up more than 1 / (k + 1) of the
+# stream is sure to survive, and every surviving count is low by at most error_bound.
+
+class MisraGries:
+    """approximate counts of the most frequent values of a stream, in O(k) memory;
+    looks like a Counter, so mode() and the histogram code accept it"""
+
+    chunk_size = 65536                          # values per batch in update_many
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counters = {}
+        self.count = 0                          # values seen
+        self.error_bound = 0                    # how far any count can be below the truth
+
+    def update(self, value):
+        """adds one value"""
+        counters = self.counters
+        self.count += 1
+        if value in counters:
+            counters[value] += 1
+        elif len(counters) < self.k:
+            counters[value] = 1
+        else:
+            self.error_bound += 1
+            for v in list(counters):
+                counters[v] -= 1
+                if not counters[v]:
+                    del counters[v]
+        return self
+
+    def update_many(self, values):
+        """adds every value in an iterable, counting a batch at a time"""
+        values = iter(values)
+        while batch := list(islice(values, self.chunk_size)):
+            self._merge_counts(Counter(batch), len(batch), 0)
+        return self
+
+    def merge(self, other):
+        """folds in the summary of another part of the stream"""
+        return self._merge_counts(other.counters, other.count, other.error_bound)
+
+    def _merge_counts(self, counts, count, error_bound):
+        # add the counts up, then (if there are too many) take the (k+1)th biggest count off
+        # all of them, which keeps the same guarantee (Agarwal et al., "Mergeable Summaries")
+        counters = self.counters
+        for v, c in counts.items():
+            counters[v] = counters.get(v, 0) + c
+        self.count += count
+        self.error_bound += error_bound
+        if len(counters) > self.k:
+            cut = heapq.nlargest(self.k + 1, counters.values())[-1]
+            self.counters = {v: c - cut for v, c in counters.items() if c > cut}
+            self.error_bound += cut
+        return self
+
+    def __getitem__(self, value):
+        return self.counters.get(value, 0)
+
+    def __contains__(self, value):
+        return value in self.counters
+
+    def __len__(self):
+        return len(self.counters)
+
+    def items(self):
+        return self.counters.items()
+
+    def values(self):
+        return self.counters.values()
+
+    def most_common(self, n=None):
+        """the (value, approximate count) pairs with the highest counts"""
+        if n is None:
+            return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, self.counters.items(), key=lambda item: item[1])
+
+
+# Misra-Gries forgets everything about the values it drops. A count-min sketch can estimate
+# the count of *any* value instead: it keeps depth rows of width counters, and each value
+# adds 1 to one counter per row, picked by a different hash function for each row. Other
+# values land on the same counters, so every counter overestimates; the smallest of a
+# value's depth counters is the estimate, and with probability 1 - delta it's too high by
+# less than epsilon times the number of values seen. The hashes only depend on the seed,
+# so sketches with the same seed and size built in different processes can be merged.
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+class CountMinSketch:
+    """approximate counts of every value of a stream in width x depth counters"""
+
+    def __init__(self, epsilon=0.001, delta=0.01, seed=0):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.seed = seed
+        rng = random.Random(seed)
+        self._hash_params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(_MERSENNE_PRIME))
+                             for _ in range(self.depth)]
+        self.table = [array("q", bytes(8 * self.width)) for _ in range(self.depth)]
+        self.count = 0
+
+    def _columns(self, value):
+        """the counter each row uses for value"""
+        if not isinstance(value, int):          # hash() of a str changes between processes
+            digest = hashlib.blake2b(repr(value).encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+        width = self.width
+        return [((a * value + b) % _MERSENNE_PRIME) % width for a, b in self._hash_params]
+
+    def update(self, value, count=1):
+        """adds count occurrences of value"""
+        for row, column in zip(self.table, self._columns(value)):
+            row[column] += count
+        self.count += count
+        return self
+
+    def update_many(self, values):
+        """adds every value in an iterable (each distinct value of a batch hashed once)"""
+        values = iter(values)
+        while batch := list(islice(values, MisraGries.chunk_size)):
+            for value, count in Counter(batch).items():
+                self.update(value, count)
+        return self
+
+    def merge(self, other):
+        """folds in a sketch of another part of the stream (same size and seed)"""
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("can only merge count-min sketches with the same size and seed")
+        for row, other_row in zip(self.table, other.table):
+            for column, count in enumerate(other_row):
+                if count:
+                    row[column] += count
+        self.count += other.count
+        return self
+
+    def __getitem__(self, value):
+        return min(row[column] for row, column in zip(self.table, self._columns(value)))
+
+    estimate = __getitem__
+
+
+# For the top values of a stream you can use both: Misra-Gries to pick out the candidates,
+# and a count-min sketch (fed the same stream) to count them.
+def top_k(summary, n, sketch=None):
+    """the n values with the highest counts, as (value, approximate count) pairs"""
+    if sketch is None:
+        return summary.most_common(n)
+    return heapq.nlargest(n, ((v, sketch[v]) for v in summary.counters),
+                          key=lambda item: item[1])
 
 
 # Less commonly you might want to look at the mode, or most-common value[s]:
 def mode(x):
-    """returns a list, might be more than one mode"""
-    counts = Counter(x)
+    """returns a list, might be more than one mode
+    (x can also be a MisraGries summary, for an approximate answer)"""
+    if isinstance(x, MisraGries):
+        counts = x
+    elif is_ndarray(x) and x.dtype.kind in "iu" and x.size:
+        np = load_numpy()
+        if x.min() >= 0 and x.max() <= 4 * x.size:
+            counts = np.bincount(x)                 # dense small integers: no hashing at all
+            return (counts == counts.max()).nonzero()[0].tolist()
+        # sparse or negative ids: a bincount would be as long as the largest of them
+        values, counts = np.unique(x, return_counts=True)
+        return values[counts == counts.max()].tolist()
+    else:
+        counts = Counter(x)
     max_count = max(counts.values())
     return [x_i for x_i, count in counts.items()
             if count == max_count]
 
-mode(num_friends) # 1 and 6
+if __name__ == "__main__":
+    mode(num_friends) # 1 and 6
 
 
 '''
@@ -110,9 +711,10 @@ which is just the difference between the largest and smallest elements:
 '''
 # "range" already means something in Python, so we'll use a different name
 def data_range(x):
-    return max(x) - min(x)
+    return RunningStats(track_variance=False).update_many(x).range
 
-print(data_range(num_friends)) # 99
+if __name__ == "__main__":
+    print(data_range(num_friends)) # 99
 
 
 '''
@@ -122,3 +724,213 @@ lots of 50s. But it seems like the first data set “should” be more spread ou
 A more complex measure of dispersion is the variance, which is computed as:
 '''
 
+# variance = sum((x_i - mean(x))**2 for x_i in x) / (n - 1)
+
+# which RunningStats keeps track of as it goes, so it takes one pass (and works on streams):
+def variance(x):
+    """assumes x has at least two elements"""
+    return RunningStats(track_extremes=False).update_many(x).variance
+
+if __name__ == "__main__":
+    variance(num_friends)                               # 81.54
+
+def standard_deviation(x):
+    return math.sqrt(variance(x))
+
+if __name__ == "__main__":
+    standard_deviation(num_friends)                     # 9.03
+
+
+'''
+Correlation
+Whereas variance measures how a single variable deviates from its mean, covariance
+measures how two variables vary in tandem from their means:
+covariance = sum((x_i - mean(x)) * (y_i - mean(y))) / (n - 1)
+A “large” positive covariance means that x tends to be large when y is large and small
+when y is small. Because its units are the product of the inputs' units it's hard to
+interpret, so it's more common to look at the correlation, which divides out the
+standard deviations of both variables and always lies between -1 and 1.
+'''
+
+# With k features we want all k * k of these, and calling covariance on every pair of columns
+# would go over the data k * k times. Instead, RunningCovariance keeps the count, the mean of
+# every feature and the k x k matrix of co-moments (sums of products of deviations from the
+# means) as rows go by. Like RunningStats, a chunk of rows is summarized on its own and merged
+# in with Chan et al.'s formula, so the whole matrix takes one pass over the data, the data
+# can be a stream, and chunks can be summarized by different workers. Array-backed inputs
+# (NumPy arrays, ch4 Matrices, columnar datasets) are summarized a chunk at a time with
+# NumPy; lists of rows, like ch4's data, with a dot product of columns per pair of features.
+
+class RunningCovariance:
+    """count, means, covariance matrix and correlation matrix of the rows (each a list of k
+    feature values) seen so far, in O(k * k) memory"""
+
+    chunk_size = 65536                          # rows per batch
+
+    def __init__(self):
+        self.count = 0
+        self.means = None                       # per feature
+        self.comoments = None                   # comoments[a][b] = sum of da * db
+
+    def update(self, row):
+        """adds one row"""
+        return self._merge_summary(1, list(map(float, row)), [[0.0] * len(row) for _ in row])
+
+    def update_many(self, rows):
+        """adds a list or iterable of rows, an array-backed table, or (with NumPy installed)
+        a 2-D NumPy array, a chunk at a time"""
+        chunks = _array_chunks(rows, self.chunk_size)
+        if chunks is not None:
+            for chunk in chunks:
+                self._merge_summary(*_summarize_array_rows(chunk))
+            return self
+        rows = iter(rows)
+        while batch := list(islice(rows, self.chunk_size)):
+            self._merge_summary(*_summarize_rows(batch))
+        return self
+
+    def merge(self, other):
+        """folds in the summary of other rows (another chunk, another worker's share)"""
+        if not other.count:
+            return self
+        return self._merge_summary(other.count, other.means, other.comoments)
+
+    def _merge_summary(self, n, means, comoments):
+        if not n:
+            return self
+        if not self.count:
+            self.count, self.means, self.comoments = n, list(means), [list(row) for row in comoments]
+            return self
+        if len(means) != len(self.means):
+            raise ValueError(f"rows have different lengths ({len(self.means)} and {len(means)})")
+        total = self.count + n
+        delta = [m - self_m for m, self_m in zip(means, self.means)]
+        weight = self.count * n / total
+        self.comoments = [[c + other_c + d_a * d_b * weight
+                           for c, other_c, d_b in zip(row, other_row, delta)]
+                          for row, other_row, d_a in zip(self.comoments, comoments, delta)]
+        self.means = [m + d * n / total for m, d in zip(self.means, delta)]
+        self.count = total
+        return self
+
+    @property
+    def covariance_matrix(self):
+        """the sample covariances (dividing by n - 1), as a list of rows"""
+        if self.count < 2:
+            raise ValueError("covariance requires at least two rows")
+        return [[c / (self.count - 1) for c in row] for row in self.comoments]
+
+    @property
+    def correlation_matrix(self):
+        """the correlations, as a list of rows (0 for a feature that doesn't vary)"""
+        if self.count < 2:
+            raise ValueError("correlation requires at least two rows")
+        scales = [math.sqrt(row[a]) for a, row in enumerate(self.comoments)]
+        return [[c / (s_a * s_b) if s_a > 0 and s_b > 0 else 0
+                 for c, s_b in zip(row, scales)]
+                for row, s_a in zip(self.comoments, scales)]
+
+    def __repr__(self):
+        k = len(self.means) if self.means is not None else 0
+        return f"RunningCovariance(count={self.count}, features={k})"
+
+
+def _summarize_rows(rows):
+    """count, means and co-moments of a non-empty list of rows"""
+    n = len(rows)
+    columns = list(zip(*rows))
+    if any(len(row) != len(columns) for row in rows):
+        raise ValueError("rows have different lengths")
+    means = [sum(column) / n for column in columns]
+    deviations = [[v - m for v in column] for column, m in zip(columns, means)]
+    k = len(columns)
+    comoments = [[0.0] * k for _ in range(k)]
+    for a in range(k):
+        for b in range(a, k):                   # (symmetric: compute each pair once)
+            comoments[a][b] = comoments[b][a] = sum(map(float.__mul__, deviations[a], deviations[b]))
+    return n, means, comoments
+
+def _summarize_array_rows(chunk):
+    n = chunk.shape[0]
+    if not n:
+        return 0, [], []
+    means = chunk.mean(axis=0)
+    deviations = chunk - means
+    return n, means.tolist(), (deviations.T @ deviations).tolist()
+
+def _array_chunks(rows, chunk_size):
+    """2-D float64 NumPy arrays of up to chunk_size rows of an array-backed table, or None if
+    rows isn't one (or NumPy isn't installed)"""
+    linear_algebra = sys.modules.get(f"{__package__}.ch4_linear_algebra")
+    columnar = sys.modules.get(f"{__package__}.columnar")
+    if is_ndarray(rows):
+        table = rows if rows.ndim == 2 else rows.reshape(len(rows), -1)
+    elif linear_algebra is not None and isinstance(rows, linear_algebra.Matrix):
+        np = load_numpy()
+        if np is None:
+            return None
+        table = np.asarray(rows.data, dtype=np.float64).reshape(rows.shape)
+    elif columnar is not None and isinstance(rows, columnar.ColumnarDataset):
+        np = load_numpy()
+        if np is None:
+            return None
+        columns = [rows.as_numpy(j) for j in range(rows.shape[1])]
+        return (np.column_stack([column[start:start + chunk_size] for column in columns])
+                .astype(np.float64, copy=False)
+                for start in range(0, len(rows), chunk_size))
+    else:
+        return None
+    np = load_numpy()
+    return (np.asarray(table[start:start + chunk_size], dtype=np.float64)
+            for start in range(0, len(table), chunk_size))
+
+
+def _summarize_chunk(rows):
+    return RunningCovariance().update_many(rows)
+
+def _running_covariance(data, workers=None):
+    """a RunningCovariance of data; with workers, data is an iterable of chunks (lists of
+    rows, or arrays) that are summarized in that many processes"""
+    if workers is None:
+        return RunningCovariance().update_many(data)
+    from concurrent.futures import ProcessPoolExecutor
+    summary = RunningCovariance()
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk_summary in pool.map(_summarize_chunk, data):
+            summary.merge(chunk_summary)
+    return summary
+
+def covariance_matrix(data, workers=None):
+    """the k x k sample covariance matrix of the features (columns) of data, a list of rows
+    (or any table RunningCovariance takes), in one pass; with workers, data is an iterable
+    of chunks of rows, summarized in parallel"""
+    return _running_covariance(data, workers).covariance_matrix
+
+def correlation_matrix(data, workers=None):
+    """the k x k correlation matrix of the features of data, like covariance_matrix"""
+    return _running_covariance(data, workers).correlation_matrix
+
+
+def _pairs(x, y):
+    if hasattr(x, "__len__") and hasattr(y, "__len__") and len(x) != len(y):
+        raise ValueError(f"x and y have different lengths ({len(x)} and {len(y)})")
+    if is_ndarray(x) or is_ndarray(y):
+        np = load_numpy()
+        return np.column_stack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+    return zip(x, y)
+
+def covariance(x, y):
+    return RunningCovariance().update_many(_pairs(x, y)).covariance_matrix[0][1]
+
+if __name__ == "__main__":
+    daily_minutes = [1, 68.77, 51.25, 52.08, 38.36,
+                     # ... and lots more
+                     ]
+    covariance(num_friends, daily_minutes)              # 22.43
+
+def correlation(x, y):
+    """between -1 and 1; 0 if either x or y doesn't vary"""
+    return RunningCovariance().update_many(_pairs(x, y)).correlation_matrix[0][1]
+
+if __name__ == "__main__":
+    correlation(num_friends, daily_minutes)             # 0.25
@@ -0,0 +1,215 @@
+# ch4 keeps a dataset as a list of rows, data = [[70, 170, 40], [65, 120, 26], ...], so
+# get_column(data, j) has to walk every row to pull one feature out of it, and every number
+# is a separate Python object. A ColumnarDataset turns that around: each column is one
+# contiguous typed array (float64, float32, int64 or int32, chosen per column), so a column
+# is a zero-copy view that statistics can run over directly, and rows are put together only
+# when someone asks for one. It still looks like a list of rows to shape, get_row and
+# get_column.
+#
+#   data = ColumnarDataset.from_rows(rows, names=["height", "weight", "age"],
+#                                    dtypes=["float32", "float32", "int32"])
+#   mean(data.column("weight"))                       # no rows built, nothing copied
+#   data.save("people.col")
+#   with ColumnarDataset.load("people.col") as people:
+#       median(people.column("age"))                  # reads only the age column's pages
+#
+# The file format is a small header followed by the columns, each stored contiguously
+# (and 64-byte aligned) in the machine's byte order:
+#
+#   b"FTCOL1\0\0" | header length (uint64) | JSON header | padding | column 0 | column 1 | ...
+#
+# where the JSON header is {"num_rows": n, "columns": [{"name", "dtype", "offset"}, ...]}
+# and the offsets count from the first 64-byte boundary after it.
+
+from array import array
+import json
+import mmap
+import os
+import struct
+
+from ._arrays import DTYPES, is_ndarray, load_numpy
+
+_MAGIC = b"FTCOL1\0\0"
+_ALIGNMENT = 64
+
+
+def _as_view(values, dtype):
+    """values as a flat memoryview of `dtype` numbers, without copying them if they already
+    are (an array, memoryview or NumPy array of that type)"""
+    code = DTYPES[dtype]
+    if is_ndarray(values):
+        values = load_numpy().ascontiguousarray(values, dtype=dtype)
+        return memoryview(values).cast("B").cast(code)
+    if isinstance(values, (array, memoryview)):
+        view = memoryview(values)
+        if view.format == code and view.ndim == 1:
+            return view
+    return memoryview(array(code, values))
+
+
+class ColumnarDataset:
+    """a table of numbers stored column by column, each column one typed array"""
+
+    def __init__(self, columns, names=None, dtypes="float64"):
+        """columns: a list of columns (each a list, array or NumPy array of numbers), or a
+        dict of them by name; dtypes: one dtype for every column, or a list of them"""
+        if isinstance(columns, dict):
+            names, columns = list(columns), list(columns.values())
+        columns = list(columns)
+        names = list(names) if names is not None else [f"column_{j}" for j in range(len(columns))]
+        if isinstance(dtypes, str):
+            dtypes = [dtypes] * len(columns)
+        if not len(names) == len(dtypes) == len(columns):
+            raise ValueError(f"{len(columns)} columns, but {len(names)} names "
+                             f"and {len(dtypes)} dtypes")
+        for dtype in dtypes:
+            if dtype not in DTYPES:
+                raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        if len(set(names)) != len(names):
+            raise ValueError("column names must be unique")
+        self.names = names
+        self.dtypes = list(dtypes)
+        self.columns = [_as_view(column, dtype) for column, dtype in zip(columns, self.dtypes)]
+        lengths = {len(column) for column in self.columns}
+        if len(lengths) > 1:
+            raise ValueError("columns have different lengths "
+                             f"({', '.join(map(str, sorted(lengths)))})")
+        self.num_rows = lengths.pop() if lengths else 0
+        self._index = {name: j for j, name in enumerate(names)}
+        self._mmap = None                           # the file the columns live in, if loaded
+
+    @classmethod
+    def from_rows(cls, rows, names=None, dtypes="float64"):
+        """a ColumnarDataset of a list of rows (like ch4's data)"""
+        rows = list(rows)
+        num_cols = len(names) if names is not None else len(rows[0]) if rows else 0
+        if any(len(row) != num_cols for row in rows):
+            raise ValueError(f"every row needs {num_cols} values")
+        columns = list(zip(*rows)) if rows else [[] for _ in range(num_cols)]
+        return cls(columns, names, dtypes)
+
+    @property
+    def shape(self):
+        return self.num_rows, len(self.columns)
+
+    def _column_index(self, j):
+        if isinstance(j, str):
+            if j not in self._index:
+                raise KeyError(f"no column named {j!r}")
+            return self._index[j]
+        return range(len(self.columns))[j]          # (negative and out-of-range like a list)
+
+    def column(self, j):
+        """column j (a position or a name) as a read-only view of its array: no copy"""
+        return self.columns[self._column_index(j)].toreadonly()
+
+    def as_numpy(self, j):
+        """column j as a NumPy array sharing the column's memory"""
+        j = self._column_index(j)
+        return load_numpy().frombuffer(self.columns[j], dtype=self.dtypes[j])
+
+    def row(self, i):
+        """row i as a list, put together from the columns"""
+        i = range(self.num_rows)[i]
+        return [column[i] for column in self.columns]
+
+    def select(self, columns):
+        """a ColumnarDataset of just these columns (positions or names), sharing their memory"""
+        js = [self._column_index(j) for j in columns]
+        selected = ColumnarDataset([self.columns[j] for j in js], [self.names[j] for j in js],
+                                   [self.dtypes[j] for j in js])
+        return selected
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, index):
+        """data[i] is row i, data[i:j] a list of rows, data[i, j] one entry, data["name"]
+        a column"""
+        if isinstance(index, str):
+            return self.column(index)
+        if isinstance(index, tuple):
+            i, j = index
+            return self.columns[self._column_index(j)][range(self.num_rows)[i]]
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(self.num_rows)[index]]
+        return self.row(index)
+
+    def __iter__(self):
+        for i in range(self.num_rows):
+            yield [column[i] for column in self.columns]
+
+    def tolist(self):
+        return list(self)
+
+    def save(self, path):
+        """writes the dataset to path in the columnar file format (through a temporary file
+        next to it, so a loaded dataset can be saved over the file it's mapped from)"""
+        columns, offset = [], 0
+        for name, dtype, column in zip(self.names, self.dtypes, self.columns):
+            columns.append({"name": name, "dtype": dtype, "offset": offset})
+            offset = _aligned(offset + column.nbytes)
+        header = json.dumps({"num_rows": self.num_rows, "columns": columns}).encode()
+        start = _aligned(len(_MAGIC) + 8 + len(header))
+        temporary = f"{os.fspath(path)}.{os.getpid()}.tmp"
+        f = open(temporary, "xb")
+        try:
+            with f:
+                f.write(_MAGIC + struct.pack("<Q", len(header)) + header)
+                for entry, column in zip(columns, self.columns):
+                    f.write(bytes(start + entry["offset"] - f.tell()))
+                    f.write(column)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """the dataset saved at path, memory-mapped: columns are views of the file, read
+        from disk only as they're used"""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{os.fspath(path)} isn't a columnar dataset file")
+            header_length, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = _aligned(len(_MAGIC) + 8 + header_length)  # offsets count from here
+        num_rows = header["num_rows"]
+        columns = []
+        with memoryview(buffer) as data:
+            for column in header["columns"]:
+                code = DTYPES[column["dtype"]]
+                offset = start + column["offset"]
+                columns.append(data[offset:offset + num_rows * array(code).itemsize].cast(code))
+        dataset = cls(columns, [column["name"] for column in header["columns"]],
+                      [column["dtype"] for column in header["columns"]])
+        dataset.num_rows = num_rows                 # (right even if there are no columns)
+        dataset._mmap = buffer
+        return dataset
+
+    def close(self):
+        """releases the file of a loaded dataset (its columns can't be used after this; views
+        of them handed out earlier keep the file mapped until they're gone)"""
+        if self._mmap is not None:
+            for column in self.columns:
+                column.release()
+            try:
+                self._mmap.close()
+            except BufferError:                     # those views: it's unmapped after them
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        columns = ", ".join(f"{name}: {dtype}" for name, dtype in zip(self.names, self.dtypes))
+        return f"ColumnarDataset({self.num_rows} rows; {columns})"
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
@@ -25,15 +25,17 @@ squre_of=partial(exp,power=2)
 def double(x):
     return 2*x
 
-xs=[1,2,3,4]
-twice_xs=[double(x) for x in xs]
-thrice_xs=map(double,xs)                # same as above maps a fucntion to a list.
+if __name__ == "__main__":
+    xs=[1,2,3,4]
+    twice_xs=[double(x) for x in xs]
+    thrice_xs=map(double,xs)                # same as above maps a fucntion to a list.
 list_doubler=partial(map,double)        # a fucntion that runs map on double function
 # print(*twice_xs,*thrice_xs,*list_doubler(xs))
 
 # You can use map with multiple-argument functions if you provide multiple lists:
 def multiply(x, y): return x * y
-products = map(multiply, [1, 2], [4, 5])            # [1 * 4(x1,y1), 2 * 5(x2,y2)] = [4, 10]
+if __name__ == "__main__":
+    products = map(multiply, [1, 2], [4, 5])            # [1 * 4(x1,y1), 2 * 5(x2,y2)] = [4, 10]
 # print(*products)
 
 
@@ -42,19 +44,23 @@ def is_even(x):
     """True if x is even, False if x is odd"""
     return x % 2 == 0
 
-x_evens=[x for x in xs if is_even(x)]               # [2,4]
-x_evens1=filter(is_even,xs)                         # Same as above
+if __name__ == "__main__":
+    x_evens=[x for x in xs if is_even(x)]               # [2,4]
+    x_evens1=filter(is_even,xs)                         # Same as above
 list_evener=partial(filter, is_even)               # funtion that filters even from a list
-x_evens2=list_evener(xs)
+if __name__ == "__main__":
+    x_evens2=list_evener(xs)
 
 # print(*x_evens,*x_evens1,*x_evens2)
 
 
 # And reduce combines the first two elements of a list, then that result with the third, that
 # result with the fourth, and so on, producing a single result:
-x_product = reduce(multiply, xs) # = 1 * 2 * 3 * 4 = 24
+if __name__ == "__main__":
+    x_product = reduce(multiply, xs) # = 1 * 2 * 3 * 4 = 24
 list_product = partial(reduce, multiply) # *function* that reduces a list
-x_product = list_product(xs) # again = 24
+if __name__ == "__main__":
+    x_product = list_product(xs) # again = 24
 # print(x_product,list_product(xs))
 
 
@@ -62,7 +68,8 @@ x_product = list_product(xs) # again = 24
 # Not infrequently, you’ll want to iterate over a list and use both its elements and their
 # indexes:
 
-documents=[x for x in range(100) if x%2==0 and x%3!=0]
+if __name__ == "__main__":
+    documents=[x for x in range(100) if x%2==0 and x%3!=0]
 # not Pythonic
 # for i in range(len(documents)):
 #     document = documents[i]
@@ -82,14 +89,16 @@ documents=[x for x in range(100) if x%2==0 and x%3!=0]
 # Often we will need to zip two or more lists together. 
 # zip transforms multiple lists into a single list of tuples of corresponding elements:
 
-list1 = ['a', 'b', 'c']
-list2 = [1, 2, 3]
+if __name__ == "__main__":
+    list1 = ['a', 'b', 'c']
+    list2 = [1, 2, 3]
 # print(*zip(list1, list2))
 
 # If the lists are different lengths, zip stops as soon as the first list ends.
 # You can also “unzip” a list using a strange trick:
-pairs = [('a', 1), ('b', 2), ('c', 3)]
-letters, numbers = zip(*pairs)
+if __name__ == "__main__":
+    pairs = [('a', 1), ('b', 2), ('c', 3)]
+    letters, numbers = zip(*pairs)
 # print(letters,numbers)
 # print(*pairs,type(pairs),sep='\n')
 
@@ -113,8 +122,9 @@ def magic(*args, **kwargs):
 # list (or tuple) and dict to supply arguments to a function:
 def other_way_magic(x, y, z):
     return x + y + z
-x_y_list = [1, 2]
-z_dict = { "z" : 3 }
+if __name__ == "__main__":
+    x_y_list = [1, 2]
+    z_dict = { "z" : 3 }
 # print(other_way_magic(*x_y_list, **z_dict)) 
 
 
@@ -127,5 +137,511 @@ def doubler_correct(f):
         """whatever arguments g is supplied, pass them through to f"""
         return 2 * f(*args, **kwargs)
     return g
-g = doubler_correct(f2)
-print(g(*x_y_list)) # 6
+if __name__ == "__main__":
+    g = doubler_correct(f2)
+    print(g(*x_y_list)) # 6
+
+
+# The same pass-through trick makes a profiler. instrument(f) returns a g that times every
+# call to f (wall clock and CPU), counts it, and notes how big its first argument was, so
+# in a live job we can see where the time goes:
+#
+#   @instrument
+#   def slow_thing(xs): ...
+#
+#   instrument_all()                    # or every public function of ch4 and ch5 at once
+#   ...                                 # run the job
+#   print(profile_report())             # calls, time, p50/p95/p99 latency, input sizes
+#
+# While instrumentation is off (instrumentation_enabled(False)) the wrappers just call
+# through, and instrument_all(False) puts the original functions back, so a job that doesn't
+# profile pays nothing at all.
+
+import json
+import math
+import threading
+import time
+from functools import wraps
+
+_HISTOGRAM_STEPS = 8                    # latency buckets per doubling (~9% wide)
+
+class CallStats:
+    """call count, wall and CPU time, a latency histogram and input sizes for one function"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_ns = 0
+        self.cpu_ns = 0
+        self.max_ns = 0
+        self.buckets = {}               # bucket -> calls whose latency fell in it
+        self.sized_calls = 0            # calls whose first argument had a len()
+        self.total_size = 0
+        self.max_size = 0
+        self._lock = threading.Lock()
+
+    def record(self, wall_ns, cpu_ns, size):
+        bucket = int(math.log2(wall_ns) * _HISTOGRAM_STEPS) if wall_ns > 0 else 0
+        with self._lock:
+            self.calls += 1
+            self.wall_ns += wall_ns
+            self.cpu_ns += cpu_ns
+            self.max_ns = max(self.max_ns, wall_ns)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            if size is not None:
+                self.sized_calls += 1
+                self.total_size += size
+                self.max_size = max(self.max_size, size)
+
+    def percentile(self, p):
+        """the latency (in seconds) that a fraction p of calls came in under, to ~9%"""
+        if not self.calls:
+            return None
+        rank = p * self.calls
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** ((bucket + 1) / _HISTOGRAM_STEPS), self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "wall_seconds": self.wall_ns / 1e9,
+            "cpu_seconds": self.cpu_ns / 1e9,
+            "mean_seconds": self.wall_ns / self.calls / 1e9 if self.calls else None,
+            "p50_seconds": self.percentile(0.50),
+            "p95_seconds": self.percentile(0.95),
+            "p99_seconds": self.percentile(0.99),
+            "max_seconds": self.max_ns / 1e9,
+            "mean_size": self.total_size / self.sized_calls if self.sized_calls else None,
+            "max_size": self.max_size if self.sized_calls else None,
+        }
+
+profile = {}                            # name -> CallStats, for every instrumented function
+_profile_lock = threading.Lock()
+_enabled = True
+
+def instrumentation_enabled(enabled=None):
+    """turns recording on or off (for every instrumented function); returns the setting"""
+    global _enabled
+    if enabled is not None:
+        _enabled = enabled
+    return _enabled
+
+def _stats_for(name):
+    with _profile_lock:
+        if name not in profile:
+            profile[name] = CallStats(name)
+        return profile[name]
+
+def _size_of(args):
+    try:
+        return len(args[0]) if args else None
+    except TypeError:                   # numbers, iterators, ... have no size
+        return None
+
+def instrument(f=None, *, name=None):
+    """wraps f so every call is recorded in profile[name] (default: module.qualname);
+    works as @instrument or @instrument(name=...)"""
+    if f is None:
+        return lambda f: instrument(f, name=name)
+    stats = _stats_for(name or f"{f.__module__}.{f.__qualname__}")
+    wall, cpu = time.perf_counter_ns, time.thread_time_ns
+    @wraps(f)
+    def g(*args, **kwargs):
+        """whatever arguments g is supplied, pass them through to f (and time it)"""
+        if not _enabled:
+            return f(*args, **kwargs)
+        start_wall, start_cpu = wall(), cpu()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            stats.record(wall() - start_wall, cpu() - start_cpu, _size_of(args))
+    g.__instrumented__ = f
+    return g
+
+_INSTRUMENTED_MODULES = ("function_tools.ch4_linear_algebra", "function_tools.ch5_statistics")
+
+def instrument_all(enabled=True, modules=_INSTRUMENTED_MODULES):
+    """wraps (or, with enabled=False, unwraps) every public function of the modules in
+    place, so calls between them are recorded too. Functions already picked up with
+    `from module import name` keep whatever they were when they were imported."""
+    import importlib
+    package = sys.modules.get("function_tools")
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        for attribute, value in list(vars(module).items()):
+            if attribute.startswith("_") or not callable(value) or isinstance(value, type):
+                continue
+            original = getattr(value, "__instrumented__", None)
+            if enabled and original is None and getattr(value, "__module__", None) == module_name:
+                replacement = instrument(value)
+            elif not enabled and original is not None:
+                replacement = original
+            else:
+                continue
+            setattr(module, attribute, replacement)
+            if package is not None and vars(package).get(attribute) is value:
+                setattr(package, attribute, replacement)    # its lazily cached copy
+
+def reset_profile():
+    """forgets everything recorded so far"""
+    with _profile_lock:
+        for name in list(profile):
+            profile[name] = CallStats(name)
+
+def profile_report(format="table", sort_by="wall_seconds"):
+    """the recorded stats of every function that's been called, slowest in total first,
+    as a text table or (format="json") a JSON object; sort_by is any summary field, largest
+    first (functions it's None for, like mean_size of unsized calls, go last)"""
+    fields = CallStats(None).summary()
+    if sort_by not in fields:
+        raise ValueError(f"sort_by must be one of {', '.join(fields)}")
+    summaries = {name: stats.summary() for name, stats in profile.items() if stats.calls}
+    summaries = dict(sorted(summaries.items(), key=lambda item: (item[1][sort_by] is None,
+                                                                -(item[1][sort_by] or 0))))
+    if format == "json":
+        return json.dumps(summaries, indent=2)
+    def ms(seconds):
+        return f"{seconds * 1e3:.3f}" if seconds is not None else "-"
+    lines = [f"{'function':<48}{'calls':>9}{'wall ms':>11}{'cpu ms':>11}{'mean ms':>10}"
+             f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean size':>11}"]
+    for name, s in summaries.items():
+        size = f"{s['mean_size']:.0f}" if s["mean_size"] is not None else "-"
+        lines.append(f"{name:<48}{s['calls']:>9}{ms(s['wall_seconds']):>11}"
+                     f"{ms(s['cpu_seconds']):>11}{ms(s['mean_seconds']):>10}"
+                     f"{ms(s['p50_seconds']):>10}{ms(s['p95_seconds']):>10}"
+                     f"{ms(s['p99_seconds']):>10}{size:>11}")
+    return "\n".join(lines)
+
+
+# Pure functions (exp, magnitude, median, ...) always give the same answer for the same
+# arguments, so when a pipeline asks the same question over and over we can remember the
+# answers. functools.lru_cache does that for hashable arguments; memoize also takes lists,
+# dicts, Vectors, Matrices and NumPy arrays (keyed by their *contents*, so changing a list
+# afterwards can't return a stale answer), and can bound the cache by entries, by bytes or
+# by age:
+#
+#   fast_median = memoize(median, maxsize=1024)
+#   cube = memoize(partial(exp, power=3))
+#   @memoize(ttl=60, max_bytes=64 << 20, fingerprint=True)
+#   def features(rows): ...
+#
+# With fingerprint=True, big arguments are keyed by a 16-byte hash of their contents rather
+# than a copy of them, which saves memory when the arguments are large.
+
+import hashlib
+import pickle
+import sys
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple("CacheInfo", "hits misses evictions expirations currsize bytes")
+_MARK = object()                                # separates positional from keyword arguments
+
+def _freeze(value):
+    """a hashable stand-in for value that's equal for equal contents"""
+    if isinstance(value, (list, tuple)):
+        items = tuple(value)
+        try:
+            hash(items)                         # all scalars (or tuples of them): done
+        except TypeError:
+            items = tuple(_freeze(item) for item in items)
+        return (type(value).__name__, items)
+    if isinstance(value, dict):
+        return ("dict", frozenset((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(_freeze(item) for item in value))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    try:                                        # Vector and Matrix keep their numbers in .data
+        view = memoryview(getattr(value, "data", value))
+    except TypeError:
+        raise TypeError(f"can't memoize on an unhashable {type(value).__name__}") from None
+    return (type(value).__name__, getattr(value, "shape", len(value)), view.format, view.tobytes())
+
+def _fingerprint(frozen):
+    """frozen, or for a container a hash of its contents (if they can be pickled)"""
+    if not isinstance(frozen, (tuple, bytes, frozenset)):
+        return frozen
+    try:
+        return ("#", hashlib.blake2b(pickle.dumps(frozen, protocol=5), digest_size=16).digest())
+    except Exception:                           # unpicklable contents: keep them as they are
+        return frozen
+
+def _bytes_of(value):
+    """roughly how much memory value takes (its own size, plus one level of contents)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(map(sys.getsizeof, value))
+    elif isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return size
+
+def memoize(f=None, *, maxsize=128, max_bytes=None, ttl=None, fingerprint=False):
+    """wraps f (a function, method or partial) so repeat calls with equal arguments return
+    the remembered result. Least recently used results are dropped beyond maxsize entries
+    (None: no limit) or max_bytes of results, and results older than ttl seconds are
+    recomputed. The wrapper has cache_info() and cache_clear(), like lru_cache."""
+    if f is None:
+        return lambda f: memoize(f, maxsize=maxsize, max_bytes=max_bytes, ttl=ttl,
+                                 fingerprint=fingerprint)
+    cache = OrderedDict()                       # key -> (result, its size, when it expires)
+    lock = threading.Lock()
+    counts = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "bytes": 0}
+    clock = time.monotonic
+    freeze = (lambda value: _fingerprint(_freeze(value))) if fingerprint else _freeze
+
+    def evict(key):
+        counts["bytes"] -= cache.pop(key)[1]
+
+    @wraps(f)
+    def g(*args, **kwargs):
+        """whatever arguments g is supplied, pass them through to f (unless we know the answer)"""
+        key = tuple(map(freeze, args))
+        if kwargs:
+            key += (_MARK,) + tuple(sorted((k, freeze(v)) for k, v in kwargs.items()))
+        with lock:
+            entry = cache.get(key)
+            if entry is not None:
+                if entry[2] is None or clock() < entry[2]:
+                    counts["hits"] += 1
+                    cache.move_to_end(key)
+                    return entry[0]
+                counts["expirations"] += 1
+                evict(key)
+            counts["misses"] += 1
+        # computed outside the lock, so two threads may both compute a missing result
+        result = f(*args, **kwargs)
+        size = _bytes_of(result) if max_bytes is not None else 0
+        if max_bytes is not None and size > max_bytes:
+            return result                       # wouldn't fit even in an empty cache
+        with lock:
+            if key in cache:
+                evict(key)
+            cache[key] = (result, size, clock() + ttl if ttl is not None else None)
+            counts["bytes"] += size
+            while ((maxsize is not None and len(cache) > maxsize)
+                   or (max_bytes is not None and counts["bytes"] > max_bytes)):
+                evict(next(iter(cache)))
+                counts["evictions"] += 1
+        return result
+
+    def cache_info():
+        with lock:
+            return CacheInfo(counts["hits"], counts["misses"], counts["evictions"],
+                             counts["expirations"], len(cache), counts["bytes"])
+
+    def cache_clear():
+        with lock:
+            cache.clear()
+            counts.update(hits=0, misses=0, evictions=0, expirations=0, bytes=0)
+
+    g.cache_info, g.cache_clear = cache_info, cache_clear
+    return g
+
+
+# list_doubler, list_evener and list_product chain map, filter and reduce one partial at a
+# time. A Stream does the same lazily, for any number of stages, and for streams too big to
+# hold in memory:
+#
+#   Stream(records).map(parse).filter(is_valid).map(score).reduce(add)
+#   Stream(records).map(parse).parallel(workers=8).chunked(10_000).collect()
+#
+# Records are read chunk_size at a time, and each chunk goes through all the stages in one
+# pass: the element-wise stages are fused into a single chain of (C-level) map and filter
+# iterators, so there are no intermediate lists and no per-stage Python loop.
+# map_chunks(f) adds a stage that gets (and returns) a whole chunk at once, for functions
+# that are cheaper called once per thousand records than once per record.
+#
+# .parallel() sends the chunks to a pool of processes (the functions have to be picklable,
+# i.e. defined at the top level of a module) or threads, with at most 2 * workers chunks
+# in flight, so memory stays bounded however long the stream is.
+
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+
+_NOTHING = object()                             # a reduction of no records
+
+def _run_stages(stages, chunk):
+    """the chunk (a list) after every stage, as a list"""
+    records = iter(chunk)
+    for kind, f in stages:
+        if kind == "map":
+            records = map(f, records)
+        elif kind == "filter":
+            records = filter(f, records)
+        else:                                   # "chunk": f takes the whole chunk
+            records = iter(f(list(records)))
+    return list(records)
+
+def _reduce(f, records, initial=_NOTHING):
+    """reduce(f, records[, initial]), or _NOTHING if there's nothing to reduce"""
+    records = iter(records)
+    if initial is _NOTHING:
+        initial = next(records, _NOTHING)
+    return initial if initial is _NOTHING else reduce(f, records, initial)
+
+def _reduce_chunk(stages, f, chunk):
+    """[the chunk reduced], or [] if no record of it made it through the stages
+    (a list rather than _NOTHING, which isn't the same object in another process)"""
+    result = _reduce(f, _run_stages(stages, chunk))
+    return [] if result is _NOTHING else [result]
+
+class Stream:
+    """a lazy pipeline of map / filter stages over an iterable, run chunk by chunk"""
+
+    def __init__(self, source, stages=(), chunk_size=1024, workers=None, executor="process",
+                 ordered=True):
+        self.source = source
+        self.stages = tuple(stages)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.executor = executor
+        self.ordered = ordered
+
+    def _with(self, **changes):
+        settings = dict(stages=self.stages, chunk_size=self.chunk_size, workers=self.workers,
+                        executor=self.executor, ordered=self.ordered)
+        settings.update(changes)
+        return Stream(self.source, **settings)
+
+    def map(self, f):
+        return self._with(stages=self.stages + (("map", f),))
+
+    def filter(self, predicate):
+        return self._with(stages=self.stages + (("filter", predicate),))
+
+    def map_chunks(self, f):
+        """f gets a list of up to chunk_size records and returns a list (or iterable) of results"""
+        return self._with(stages=self.stages + (("chunk", f),))
+
+    def chunked(self, chunk_size):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        return self._with(chunk_size=chunk_size)
+
+    def parallel(self, workers=None, executor="process", ordered=True):
+        """runs the stages in a pool of `workers` (default: one per CPU) processes or threads;
+        with ordered=False results come out as soon as their chunk is done"""
+        if executor not in ("process", "thread"):
+            raise ValueError("executor must be 'process' or 'thread'")
+        return self._with(workers=workers or os.cpu_count() or 1, executor=executor,
+                          ordered=ordered)
+
+    def _source_chunks(self):
+        records = iter(self.source)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _results(self, task, *args):
+        """task(stages, *args, chunk) for every chunk, in order unless self.ordered is False"""
+        if self.workers is None:
+            for chunk in self._source_chunks():
+                yield task(self.stages, *args, chunk)
+            return
+        pool_type = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+        with pool_type(self.workers) as pool:
+            pending = deque()
+            for chunk in self._source_chunks():
+                pending.append(pool.submit(task, self.stages, *args, chunk))
+                while len(pending) >= 2 * self.workers:
+                    yield from self._finished(pending)
+            while pending:
+                yield from self._finished(pending)
+
+    def _finished(self, pending):
+        """takes the next result (or, unordered, all the finished ones) out of pending"""
+        if self.ordered:
+            yield pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+    def chunks(self):
+        """the results, a list per chunk (empty lists skipped)"""
+        return (chunk for chunk in self._results(_run_stages) if chunk)
+
+    def __iter__(self):
+        for chunk in self._results(_run_stages):
+            yield from chunk
+
+    def collect(self):
+        return list(self)
+
+    def reduce(self, f, initial=_NOTHING):
+        """reduce(f, stream[, initial]); with workers, each chunk is reduced in the pool and
+        the chunk results are reduced here, so f has to be associative (and commutative too
+        if the stream is unordered)"""
+        if self.workers is None:
+            result = _reduce(f, self, initial)
+        else:
+            partials = (result for chunk in self._results(_reduce_chunk, f) for result in chunk)
+            result = _reduce(f, partials, initial)
+        if result is _NOTHING:
+            raise TypeError("reduce() of empty stream with no initial value")
+        return result
+
+    def count(self):
+        return sum(map(len, self._results(_run_stages)))
+
+    def sum(self):
+        return self.reduce(add, 0)
+
+    def __repr__(self):
+        stages = "".join(f".{'map_chunks' if kind == 'chunk' else kind}({getattr(f, '__name__', f)})"
+                         for kind, f in self.stages)
+        run = (f".parallel({self.workers}, {self.executor!r}, ordered={self.ordered})"
+               if self.workers is not None else "")
+        return f"Stream({type(self.source).__name__}){stages}{run}.chunked({self.chunk_size})"
+
+
+# reduce(multiply, xs) computes (((x1 * x2) * x3) * x4) ...: one long chain, one core. If op
+# is associative we're free to bracket it any other way, e.g. as a balanced tree
+#   ((x1 * x2) * (x3 * x4)) * ((x5 * x6) * (x7 * x8))
+# whose halves can be computed at the same time. parallel_reduce reduces chunks of the
+# iterable in worker processes and combines the chunk results as a tree. With pairwise=True
+# the chunks are reduced as trees too, so every value goes through only log2(n) additions
+# instead of up to n, which keeps rounding error down when summing floats (or vectors of
+# them). Balanced trees also help when the values grow, like the big integers of a long
+# product: each multiplication is between numbers of similar size.
+
+def _tree_reduce(op, values):
+    """op(... op(op(v1, v2), op(v3, v4)) ...), pairing neighbors until one value is left"""
+    values = list(values)
+    while len(values) > 1:
+        paired = [op(values[i], values[i + 1]) for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
+
+def _reduce_part(stages, op, pairwise, chunk):
+    """reduces one chunk (which is never empty) in a worker"""
+    return _tree_reduce(op, chunk) if pairwise else reduce(op, chunk)
+
+def parallel_reduce(op, iterable, identity=_NOTHING, workers=None, chunk_size=10_000,
+                    pairwise=False):
+    """reduce(op, iterable), for an associative op, with chunks reduced in `workers`
+    processes (default: one per CPU; 1 reduces in this process) and combined as a balanced
+    tree. op and the values have to be picklable. An empty iterable reduces to identity."""
+    stream = Stream(iterable).chunked(chunk_size)
+    if (workers or os.cpu_count() or 1) > 1:
+        stream = stream.parallel(workers)
+    partials = list(stream._results(_reduce_part, op, pairwise))
+    if partials:
+        return _tree_reduce(op, partials)
+    if identity is _NOTHING:
+        raise TypeError("parallel_reduce() of empty iterable with no identity")
+    return identity
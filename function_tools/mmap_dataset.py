@@ -0,0 +1,328 @@
+# A list of 100 million floats takes about 3 GB, since every float is its own Python object.
+# The same numbers in a flat binary file of float64s take 800 MB, and if we memory-map the
+# file the operating system pages it in as we read it, so we never need the whole thing in
+# memory at once (or even in our own process: every worker can map the same file).
+#
+# MappedArray exposes such a file (float64, float32, int64 or int32 values, in the machine's
+# byte order) as a read-only sequence without copying it. The statistics at the bottom of
+# the module split the file into chunks, summarize the chunks in a process pool, and merge
+# the summaries, the way ch5_statistics' RunningStats and MisraGries are built to be merged.
+
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import math
+import mmap
+import os
+
+from ._arrays import DTYPES, load_numpy
+from .ch5_statistics import MisraGries, RunningStats
+
+
+def write_binary(path, values, dtype="float64"):
+    """writes values to path as a flat binary file MappedArray can read"""
+    with open(path, "wb") as f:
+        array(DTYPES[dtype], values).tofile(f)
+
+
+class MappedArray(Sequence):
+    """a flat binary file of numbers, memory-mapped and read as a sequence"""
+
+    def __init__(self, path, dtype="float64"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        self.path = os.fspath(path)
+        self.dtype = dtype
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # (an empty file can't be mapped, but it can be an empty sequence)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        buffer = self._mmap if self._mmap is not None else b""
+        if size % array(DTYPES[dtype]).itemsize:
+            raise ValueError(f"{self.path} isn't a whole number of {dtype} values")
+        self.values = memoryview(buffer).cast(DTYPES[dtype])
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]                       # slices are memoryviews too: no copies
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def as_numpy(self):
+        """the values as a read-only NumPy array sharing the mapped memory"""
+        return load_numpy().frombuffer(self.values, dtype=self.dtype)
+
+    def chunk_bounds(self, chunk_size):
+        """(start, stop) index pairs splitting the values into chunks"""
+        n = len(self)
+        return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    def close(self):
+        self.values.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"MappedArray({self.path!r}, dtype={self.dtype!r}, len={len(self)})"
+
+
+# Each worker maps the file itself (once per process) and reads only its own chunk, so all
+# that crosses between processes is a path, two indexes and a small summary. The maps are
+# kept by the file's identity as well as its path, so a file rewritten since it was mapped
+# (or a stale map a forked worker inherited) is mapped afresh rather than read as it was.
+
+_open_files = {}
+
+def _file_key(path, dtype):
+    stat = os.stat(path)
+    return path, dtype, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def _close_quietly(mapped):
+    try:
+        mapped.close()
+    except BufferError:                             # a chunk of it is still in use somewhere
+        pass
+
+def _close_open_files():
+    while _open_files:
+        _close_quietly(_open_files.popitem()[1])
+
+def _chunk(path, dtype, start, stop):
+    """the values[start:stop] of a file, as a NumPy array if possible, else a memoryview"""
+    np = load_numpy()
+    key = _file_key(path, dtype)
+    if key not in _open_files:
+        for stale in [other for other in _open_files if other[:2] == key[:2]]:
+            _close_quietly(_open_files.pop(stale))
+        _open_files[key] = MappedArray(path, dtype)
+    values = _open_files[key].values[start:stop]
+    return np.frombuffer(values, dtype=dtype) if np is not None else values
+
+
+def _summarize_chunk(path, dtype, start, stop):
+    return RunningStats(track_variance=False).update_many(_chunk(path, dtype, start, stop))
+
+
+def _count_chunk(path, dtype, start, stop, k):
+    values = _chunk(path, dtype, start, stop)
+    np = load_numpy()
+    if k is not None:
+        return MisraGries(k).update_many(values.tolist() if np is not None else values)
+    if np is not None:
+        distinct, counts = np.unique(values, return_counts=True)
+        return Counter(dict(zip(distinct.tolist(), counts.tolist())))
+    return Counter(values)
+
+
+def _comparable_chunk(path, dtype, start, stop):
+    """the chunk, widened so NumPy compares float32s with Python floats exactly"""
+    values = _chunk(path, dtype, start, stop)
+    np = load_numpy()
+    if dtype == "float32" and np is not None:
+        values = values.astype(np.float64)
+    return values
+
+def _histogram_chunk(path, dtype, start, stop, windows):
+    """for each window (lo, hi, edges), how many values of the chunk fall in each bin"""
+    values = _comparable_chunk(path, dtype, start, stop)
+    np = load_numpy()
+    histograms = []
+    for lo, hi, edges in windows:
+        if np is not None:
+            inside = values[(values >= lo) & (values <= hi)]
+            bins = np.minimum(np.searchsorted(edges, inside, side="right") - 1, len(edges) - 2)
+            histograms.append(np.bincount(bins, minlength=len(edges) - 1).tolist())
+        else:
+            counts = [0] * (len(edges) - 1)
+            last = len(edges) - 2
+            for x in values:
+                if lo <= x <= hi:
+                    counts[min(bisect_right(edges, x) - 1, last)] += 1
+            histograms.append(counts)
+    return histograms
+
+
+def _infinities_chunk(path, dtype, start, stop):
+    """(how many values of the chunk are -inf, how many +inf, a RunningStats of the rest)"""
+    values = _chunk(path, dtype, start, stop)
+    np = load_numpy()
+    finite = RunningStats(track_variance=False)
+    if np is not None:
+        finite.update_many(values[np.isfinite(values)])
+        return int((values == -np.inf).sum()), int((values == np.inf).sum()), finite
+    values = values.tolist()
+    finite.update_many(x for x in values if math.isfinite(x))
+    return values.count(-math.inf), values.count(math.inf), finite
+
+
+def _collect_chunk(path, dtype, start, stop, windows):
+    """for each window (lo, hi), the values of the chunk that fall in it"""
+    values = _comparable_chunk(path, dtype, start, stop)
+    np = load_numpy()
+    if np is not None:
+        return [values[(values >= lo) & (values <= hi)].tolist() for lo, hi in windows]
+    return [[x for x in values if lo <= x <= hi] for lo, hi in windows]
+
+
+def _as_mapped(data, dtype):
+    return data if isinstance(data, MappedArray) else MappedArray(data, dtype)
+
+@contextmanager
+def _chunk_runner(data, workers, chunk_size):
+    """yields run(fn, *args), which calls fn(path, dtype, start, stop, *args) for every
+    chunk of data, in a pool of worker processes unless workers is 1"""
+    tasks = [(data.path, data.dtype, start, stop) for start, stop in data.chunk_bounds(chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        try:
+            yield lambda fn, *args: [fn(*task, *args) for task in tasks]
+        finally:
+            _close_open_files()                     # (the workers' maps go with the workers)
+        return
+    with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+        yield lambda fn, *args: list(pool.map(fn, *zip(*[task + args for task in tasks])))
+
+
+def _summarize(run):
+    summary = RunningStats(track_variance=False)
+    for chunk_summary in run(_summarize_chunk):
+        summary.merge(chunk_summary)
+    return summary
+
+def summarize(data, dtype="float64", workers=None, chunk_size=1 << 22):
+    """a RunningStats (count, sum, min, max) of a binary file, built chunk by chunk in parallel"""
+    data = _as_mapped(data, dtype)
+    with _chunk_runner(data, workers, chunk_size) as run:
+        return _summarize(run)
+
+def mean(data, dtype="float64", workers=None, chunk_size=1 << 22):
+    return summarize(data, dtype, workers, chunk_size).mean
+
+def data_range(data, dtype="float64", workers=None, chunk_size=1 << 22):
+    return summarize(data, dtype, workers, chunk_size).range
+
+
+# Exact quantiles can't be merged the way sums can, but they can be narrowed down. We know
+# the smallest and largest values; one parallel pass counts the values in each of `bins`
+# equal slices between them, which tells us which slice holds the value we want (and how
+# many values are below it). If that slice is small enough we collect just its values and
+# sort them; otherwise we slice it up again. Each pass only sends bin counts (or the few
+# values in one slice) back to the parent process.
+
+def _bin_edges(lo, hi, bins):
+    edges = sorted(set([lo + (hi - lo) * i / bins for i in range(bins)] + [hi]))
+    if len(edges) < 3:                              # lo and hi are neighboring floats
+        edges = [lo, hi, hi]
+    return edges
+
+def _check_ranks(ranks, n):
+    """ranks as non-negative positions (counting negative ones from the end, like a list)"""
+    ranks = [k + n if k < 0 else k for k in ranks]
+    if any(not 0 <= k < n for k in ranks):
+        raise IndexError("list index out of range")
+    return ranks
+
+def _order_statistics(data, ranks, workers, chunk_size, bins, collect_limit):
+    """{k: sorted(data)[k] for k in ranks}"""
+    found = {}
+    with _chunk_runner(data, workers, chunk_size) as run:
+        summary = _summarize(run)
+        lo, hi, below, count = summary.min, summary.max, 0, summary.count
+        if lo != hi and (math.isinf(lo) or math.isinf(hi)):
+            # bins between infinities would be nan wide: the infinities are the first and
+            # last ranks, and the rest are searched for between the finite extremes
+            negative, positive, finite = 0, 0, RunningStats(track_variance=False)
+            for chunk_negative, chunk_positive, chunk_finite in run(_infinities_chunk):
+                negative += chunk_negative
+                positive += chunk_positive
+                finite.merge(chunk_finite)
+            for k in ranks:
+                if k < negative:
+                    found[k] = -math.inf
+                elif k >= count - positive:
+                    found[k] = math.inf
+            lo, hi, below, count = finite.min, finite.max, negative, finite.count
+        # a search is [rank, lo, hi, number of values < lo, number of values in [lo, hi]]
+        searches = [[k, lo, hi, below, count] for k in set(ranks) if k not in found]
+        while searches:
+            for k, lo, hi, _, _ in searches:
+                if lo == hi:
+                    found[k] = lo                   # only one value it could be
+            searches = [search for search in searches if search[0] not in found]
+            small = [search for search in searches if search[4] <= collect_limit]
+            if small:
+                collected = run(_collect_chunk, [(lo, hi) for _, lo, hi, _, _ in small])
+                for i, (k, _, _, below, _) in enumerate(small):
+                    window = sorted(x for chunk in collected for x in chunk[i])
+                    found[k] = window[k - below]
+                searches = [search for search in searches if search[0] not in found]
+                continue
+            windows = [(lo, hi, _bin_edges(lo, hi, bins)) for _, lo, hi, _, _ in searches]
+            histograms = run(_histogram_chunk, windows)
+            for i, search in enumerate(searches):
+                counts = [sum(column) for column in zip(*(chunk[i] for chunk in histograms))]
+                k, below, edges = search[0], search[3], windows[i][2]
+                for b, count in enumerate(counts):
+                    if below + count > k:
+                        break
+                    below += count
+                # bin b holds the values in [edges[b], edges[b + 1]), except the last,
+                # which also holds hi; either way the next window is strictly smaller
+                hi = edges[b + 1] if b == len(counts) - 1 else math.nextafter(edges[b + 1], -math.inf)
+                search[1:] = [edges[b], hi, below, count]
+    if data.dtype.startswith("int"):
+        return {k: int(value) for k, value in found.items()}
+    return found
+
+def quantiles(data, ps, dtype="float64", workers=None, chunk_size=1 << 22,
+              bins=4096, collect_limit=1 << 20):
+    """[sorted(values)[int(p * n)] for p in ps], without sorting (or loading) the values"""
+    data = _as_mapped(data, dtype)
+    ranks = _check_ranks([int(p * len(data)) for p in ps], len(data))
+    found = _order_statistics(data, ranks, workers, chunk_size, bins, collect_limit)
+    return [found[k] for k in ranks]
+
+def quantile(data, p, dtype="float64", workers=None, chunk_size=1 << 22):
+    return quantiles(data, [p], dtype, workers, chunk_size)[0]
+
+def median(data, dtype="float64", workers=None, chunk_size=1 << 22,
+           bins=4096, collect_limit=1 << 20):
+    """the 'middle-most' value, or the average of the two middle-most values"""
+    data = _as_mapped(data, dtype)
+    n = len(data)
+    midpoint = n // 2
+    if n % 2 == 1:
+        return _order_statistics(data, [midpoint], workers, chunk_size, bins, collect_limit)[midpoint]
+    _check_ranks([midpoint - 1], n)
+    found = _order_statistics(data, [midpoint - 1, midpoint], workers, chunk_size, bins, collect_limit)
+    return (found[midpoint - 1] + found[midpoint]) / 2
+
+
+def mode(data, dtype="float64", workers=None, chunk_size=1 << 22, k=None):
+    """the most common value[s], in increasing order; with k, approximately, from merged
+    MisraGries summaries of k counters each instead of exact counts"""
+    data = _as_mapped(data, dtype)
+    with _chunk_runner(data, workers, chunk_size) as run:
+        counts = MisraGries(k) if k is not None else Counter()
+        for chunk_counts in run(_count_chunk, k):
+            if k is not None:
+                counts.merge(chunk_counts)
+            else:
+                counts.update(chunk_counts)
+    if not counts:
+        raise ValueError("mode of no values" if k is None else
+                         f"no value is frequent enough to outlast a {k}-counter summary")
+    max_count = max(counts.values())
+    return sorted(x_i for x_i, count in counts.items() if count == max_count)